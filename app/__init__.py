@@ -2,16 +2,34 @@ from flask import Flask
 from flask_cors import CORS
 from app.config import Config
 from app.database.db_manager import DBManager
+from app.utils.cache_utils import TTLCache
+from app.utils.compression_utils import ResponseCompressor
+from app.utils.metrics_utils import Metrics
+from app.utils.spatial_index import SpatialIndexCache
+from app.utils.coalesce_utils import RequestCoalescer
+from app.utils.json_provider import FastJSONProvider
 
 db = DBManager()
+reference_cache = TTLCache()
+compression = ResponseCompressor()
+metrics = Metrics()
+spatial_index = SpatialIndexCache()
+coalescer = RequestCoalescer()
 
 def create_app(config_class=Config):
     app = Flask(__name__, static_folder='../static', template_folder='../templates')
     app.config.from_object(config_class)
+    app.json = FastJSONProvider(app)
 
     CORS(app)
 
-    db.init_app(app)
+    # Registered before compression so that response sizes are measured after it
+    metrics.init_app(app, db)
+    db.init_app(app, metrics=metrics)
+    reference_cache.init_app(app, name='cache')
+    compression.init_app(app)
+    spatial_index.init_app(app)
+    coalescer.init_app(app)
 
     from app.routes.city_routes import city_bp
     from app.routes.simulation_routes import simulation_bp
@@ -21,4 +39,7 @@ def create_app(config_class=Config):
     app.register_blueprint(simulation_bp, url_prefix='/api/simulations')
     app.register_blueprint(geo_object_bp, url_prefix='/api/geo-objects')
     
+    from app.commands import register_commands
+    register_commands(app)
+    
     return app
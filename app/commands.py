@@ -0,0 +1,77 @@
+"""
+CLI commands module.
+Provides maintenance commands available through the flask command line.
+"""
+import click
+from app.models import GeoObject, Simulation
+from app.services import GeoObjectService, ImportService, SnapshotService
+
+
+def register_commands(app):
+    """Register CLI commands with the Flask application"""
+
+    @app.cli.command('build-lod')
+    @click.option('--simulation-id', type=int, default=None,
+                  help='Only build LOD geometry for the objects of this simulation')
+    def build_lod(simulation_id):
+        """Precompute simplified geometry for the configured zoom levels"""
+        for zoom, tolerance in GeoObjectService.build_lod(simulation_id):
+            click.echo(f"Built LOD geometry for zoom {zoom} (tolerance {tolerance:.8f} deg)")
+
+    @app.cli.command('bump-versions')
+    @click.option('--simulation-id', type=int, default=None,
+                  help='Only bump the content version of this simulation')
+    def bump_versions(simulation_id):
+        """Give simulations a new content version after their objects were changed outside the app"""
+        GeoObject.bump_simulation_version(simulation_id)
+        target = f"simulation {simulation_id}" if simulation_id is not None else "all simulations"
+        click.echo(f"Bumped the content version of {target}")
+
+    @app.cli.command('build-snapshots')
+    @click.option('--simulation-id', type=int, multiple=True,
+                  help='Only build the snapshot of this simulation (repeatable)')
+    @click.option('--force', is_flag=True, help='Rebuild snapshots that are up to date')
+    def build_snapshots(simulation_id, force):
+        """Precompute the compressed FeatureCollection files served for whole simulations"""
+        simulation_ids = list(simulation_id) or None
+        if force:
+            for sid in simulation_ids or [None]:
+                SnapshotService.invalidate(sid)
+
+        for sid, size in SnapshotService.warm_up(simulation_ids):
+            if size is None:
+                click.echo(f"Snapshot of simulation {sid} is up to date")
+            else:
+                click.echo(f"Built snapshot of simulation {sid} ({size} bytes)")
+
+    @app.cli.command('import-geojson')
+    @click.argument('source', type=click.File('rb'))
+    @click.option('--simulation-id', type=int, default=None, help='Simulation to import the objects into')
+    @click.option('--city-id', type=int, default=None, help='City of a new simulation')
+    @click.option('--year', type=int, default=None, help='Year of a new simulation')
+    @click.option('--mode-id', type=int, default=None, help='Mode of a new simulation')
+    @click.option('--batch-size', type=int, default=None, help='Features copied per COPY statement')
+    @click.option('--strict', is_flag=True, help='Abort on the first invalid feature')
+    def import_geojson(source, simulation_id, city_id, year, mode_id, batch_size, strict):
+        """Bulk import a GeoJSON file (or - for stdin) into a simulation"""
+        if simulation_id is None:
+            if None in (city_id, year, mode_id):
+                raise click.UsageError("Pass --simulation-id, or --city-id, --year and --mode-id")
+            simulation = Simulation.get_by_city_year(city_id, year, mode_id) or \
+                Simulation.create(city_id, year, mode_id)
+            simulation_id = simulation['id']
+
+        report = ImportService.import_geojson(
+            source, simulation_id, batch_size=batch_size, strict=strict,
+            progress=lambda staged: click.echo(f"Staged {staged} features", err=True)
+        )
+        if report is None:
+            raise click.ClickException(f"Simulation {simulation_id} not found")
+
+        for error in report['errors']:
+            click.echo(f"Skipped feature {error['feature']} at '{error['path']}': {error['error']}", err=True)
+        click.echo(f"Imported {report['staged']} features into simulation {simulation_id} "
+                   f"in {report['seconds']} s ({report['features_per_second']} features/s, "
+                   f"{report['rows_per_second']} rows/s)")
+        click.echo(f"New objects: {report['inserted']}, reused: {report['reused']}, "
+                   f"links added: {report['linked']}, invalid: {report['invalid']}")
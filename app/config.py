@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-very-secret-key'
     
@@ -12,6 +14,67 @@ class Config:
     DB_USER = os.environ.get('DB_USER') or 'postgres'
     DB_PASSWORD = os.environ.get('DB_PASSWORD') or 'postgres'
     
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE') or 1)
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE') or 10)
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_MAX_USES = int(os.environ.get('DB_POOL_MAX_USES') or 5000)
+    DB_POOL_MAX_AGE = float(os.environ.get('DB_POOL_MAX_AGE') or 3600)
+    DB_POOL_PRE_PING = (os.environ.get('DB_POOL_PRE_PING') or 'True') == 'True'
+    DB_PREPARED_STATEMENTS = (os.environ.get('DB_PREPARED_STATEMENTS') or 'True') == 'True'
+    DB_STREAM_BATCH_SIZE = int(os.environ.get('DB_STREAM_BATCH_SIZE') or 2000)
+    DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS') or 500)
+    DB_COOPERATIVE = (os.environ.get('DB_COOPERATIVE') or 'True') == 'True'
+    
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'True') == 'True'
+    
+    REFERENCE_CACHE_TTL = float(os.environ.get('REFERENCE_CACHE_TTL') or 300)
+    REFERENCE_CACHE_MAX_SIZE = int(os.environ.get('REFERENCE_CACHE_MAX_SIZE') or 1024)
+    
+    GEOJSON_SQL_ASSEMBLY = (os.environ.get('GEOJSON_SQL_ASSEMBLY') or 'True') == 'True'
+    
+    GEO_LOD_ZOOM_LEVELS = [int(level) for level in (os.environ.get('GEO_LOD_ZOOM_LEVELS') or '6,8,10,12,14').split(',')]
+    GEO_LOD_PIXEL_TOLERANCE = float(os.environ.get('GEO_LOD_PIXEL_TOLERANCE') or 1.0)
+    
+    SPATIAL_INDEX_ENABLED = (os.environ.get('SPATIAL_INDEX_ENABLED') or 'False') == 'True'
+    SPATIAL_INDEX_MAX_BYTES = int(os.environ.get('SPATIAL_INDEX_MAX_BYTES') or 256 * 1024 * 1024)
+    SPATIAL_INDEX_NODE_CAPACITY = int(os.environ.get('SPATIAL_INDEX_NODE_CAPACITY') or 16)
+    
+    GEO_OBJECT_BATCH_MAX_IDS = int(os.environ.get('GEO_OBJECT_BATCH_MAX_IDS') or 1000)
+    
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 10000)
+    
+    COALESCING_ENABLED = (os.environ.get('COALESCING_ENABLED') or 'True') == 'True'
+    COALESCING_TIMEOUT = float(os.environ.get('COALESCING_TIMEOUT') or 30)
+    COALESCING_SHARED = (os.environ.get('COALESCING_SHARED') or 'False') == 'True'
+    COALESCING_RESULT_TTL = float(os.environ.get('COALESCING_RESULT_TTL') or 5)
+    COALESCING_LOCK_STRIPES = int(os.environ.get('COALESCING_LOCK_STRIPES') or 4096)
+    
+    PAGINATION_DEFAULT_LIMIT = int(os.environ.get('PAGINATION_DEFAULT_LIMIT') or 1000)
+    PAGINATION_MAX_LIMIT = int(os.environ.get('PAGINATION_MAX_LIMIT') or 10000)
+    
+    CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(basedir, 'cache')
+    TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR') or os.path.join(CACHE_DIR, 'tiles')
+    TILE_CACHE_MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_BYTES') or 512 * 1024 * 1024)
+    COALESCING_DIR = os.environ.get('COALESCING_DIR') or os.path.join(CACHE_DIR, 'coalescing')
+    
+    SNAPSHOTS_ENABLED = (os.environ.get('SNAPSHOTS_ENABLED') or 'False') == 'True'
+    SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR') or os.path.join(CACHE_DIR, 'snapshots')
+    SNAPSHOT_BUILD_ON_DEMAND = (os.environ.get('SNAPSHOT_BUILD_ON_DEMAND') or 'True') == 'True'
+    SNAPSHOT_WARMUP = (os.environ.get('SNAPSHOT_WARMUP') or 'False') == 'True'
+    SNAPSHOT_GZIP_LEVEL = int(os.environ.get('SNAPSHOT_GZIP_LEVEL') or 9)
+    SNAPSHOT_BROTLI_QUALITY = int(os.environ.get('SNAPSHOT_BROTLI_QUALITY') or 9)
+    TILE_EXTENT = int(os.environ.get('TILE_EXTENT') or 4096)
+    TILE_BUFFER = int(os.environ.get('TILE_BUFFER') or 64)
+    TILE_MAX_ZOOM = int(os.environ.get('TILE_MAX_ZOOM') or 22)
+    
+    COMPRESSION_ENABLED = (os.environ.get('COMPRESSION_ENABLED') or 'True') == 'True'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 1024)
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL') or 6)
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY') or 5)
+    COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get('COMPRESSION_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    COMPRESSION_MIMETYPES = ['application/json', 'application/geo+json', 'application/geobuf',
+                             'application/vnd.mapbox-vector-tile']
+    
     DEBUG = os.environ.get('DEBUG') == 'True'
     TESTING = os.environ.get('TESTING') == 'True'
 
@@ -4,5 +4,7 @@ This module provides easy access to the database manager.
 """
 
 from app.database.db_manager import DBManager
+from app.database.connection_pool import ConnectionPool, PoolTimeoutError
+from app.database.green import make_psycopg_green, is_gevent_patched
 
-__all__ = ['DBManager']
+__all__ = ['DBManager', 'ConnectionPool', 'PoolTimeoutError', 'make_psycopg_green', 'is_gevent_patched']
@@ -0,0 +1,217 @@
+"""
+Connection pool module.
+Provides a thread-safe pool of PostgreSQL connections with checkout health
+checks and connection recycling. Under gevent the pool is created after the
+worker is monkey-patched, so waiting for a connection only blocks the greenlet.
+"""
+import logging
+import os
+import threading
+import time
+
+from psycopg2 import extensions
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquisition timeout"""
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, timeout=30.0,
+                 max_uses=0, max_age=0, pre_ping=True):
+        """
+        Create a connection pool.
+
+        Args:
+            connect: Callable returning a new DB-API connection
+            min_size: Number of connections opened up front and kept warm
+            max_size: Maximum number of open connections (idle + in use)
+            timeout: Seconds to wait for a free connection before giving up
+            max_uses: Recycle a connection after this many checkouts (0 = never)
+            max_age: Recycle a connection older than this many seconds (0 = never)
+            pre_ping: Verify idle connections with a round trip on checkout
+        """
+        self._connect = connect
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.timeout = float(timeout)
+        self.max_uses = int(max_uses)
+        self.max_age = float(max_age)
+        self.pre_ping = pre_ping
+        self.pid = os.getpid()
+        self.logger = logging.getLogger(__name__)
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._meta = {}
+        self._size = 0
+        self._counters = {
+            'checkouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'failed_pings': 0,
+        }
+        self._wait_time = 0.0
+
+        for _ in range(self.min_size):
+            with self._cond:
+                self._size += 1
+            conn = self._open()
+            with self._cond:
+                self._idle.append(conn)
+
+    def acquire(self):
+        """Check out a healthy connection, waiting up to the pool timeout"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            conn, create = self._reserve(deadline)
+            if create:
+                conn = self._open()
+            elif self.pre_ping and not self._ping(conn):
+                self._discard(conn, 'failed_pings')
+                continue
+
+            with self._cond:
+                meta = self._meta.get(conn)
+                if meta is not None:
+                    meta['uses'] += 1
+                    self._counters['checkouts'] += 1
+                    self._wait_time += time.monotonic() - started
+                    return conn
+
+            # close_all ran while the connection was being opened or pinged, so it is no longer pooled
+            self._close_quietly(conn)
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, recycling it if it is worn out"""
+        if conn.closed or discard:
+            self._discard(conn, 'discarded')
+            return
+
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception as e:
+                self.logger.warning(f"Rollback on release failed, discarding connection: {str(e)}")
+                self._discard(conn, 'discarded')
+                return
+
+        if self._is_worn_out(conn):
+            self._discard(conn, 'recycled')
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection and forget the ones still checked out"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._meta.clear()
+            self._size = 0
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Return a snapshot of pool usage counters"""
+        with self._cond:
+            checkouts = self._counters['checkouts']
+            return {
+                'pid': self.pid,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'avg_wait_ms': round(self._wait_time / checkouts * 1000, 3) if checkouts else 0.0,
+                **self._counters
+            }
+
+    def _reserve(self, deadline):
+        """Pop an idle connection or claim a slot for a new one"""
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_worn_out(conn):
+                        self._forget(conn, 'recycled')
+                        self._close_quietly(conn)
+                        continue
+                    return conn, False
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, True
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+    def _open(self):
+        """Open a new connection for a slot already reserved in _size"""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._meta[conn] = {'created_at': time.monotonic(), 'uses': 0}
+            self._counters['created'] += 1
+        self.logger.debug("Pooled database connection established")
+        return conn
+
+    def _ping(self, conn):
+        """Run a trivial query to make sure the connection is still alive"""
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            self.logger.warning(f"Pooled connection failed health check: {str(e)}")
+            return False
+
+    def _is_worn_out(self, conn):
+        meta = self._meta.get(conn)
+        if meta is None:
+            return True
+        if self.max_uses and meta['uses'] >= self.max_uses:
+            return True
+        if self.max_age and time.monotonic() - meta['created_at'] >= self.max_age:
+            return True
+        return False
+
+    def _discard(self, conn, reason):
+        with self._cond:
+            self._forget(conn, reason)
+        self._close_quietly(conn)
+
+    def _forget(self, conn, reason):
+        """Drop bookkeeping for a connection; caller must hold the lock"""
+        if self._meta.pop(conn, None) is not None:
+            self._size -= 1
+        self._counters[reason] += 1
+        self._cond.notify()
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
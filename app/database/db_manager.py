@@ -3,86 +3,384 @@ Database manager module.
 Provides functionality for connecting to and querying the PostgreSQL database.
 """
 import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
 from psycopg2.extras import RealDictCursor
+from contextlib import contextmanager
 from flask import current_app, g
+import hashlib
+import io
 import logging
+import os
+import re
+import threading
+import time
+import uuid
+import weakref
+from app.database.connection_pool import ConnectionPool
+from app.database import green
+
+PLACEHOLDER_PATTERN = re.compile(r'%(s|%)')
 
 class DBManager:
     def __init__(self):
         self.conn = None
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        self.statements = {}
+        self._prepared = weakref.WeakKeyDictionary()
+        self.metrics = None
+        self.cooperative = False
         self.logger = logging.getLogger(__name__)
     
-    def init_app(self, app):
-        """Initialize with Flask app configuration"""
+    def init_app(self, app, metrics=None):
+        """Initialize with Flask app configuration, reporting statement metrics to metrics if given"""
+        self.metrics = metrics
         app.teardown_appcontext(self.close_connection)
         
+        # Under gevent workers queries yield to other requests instead of blocking the worker.
+        # The pool's locks come from the patched threading module once the worker is patched.
+        if app.config['DB_COOPERATIVE'] and green.is_gevent_patched():
+            self.cooperative = green.make_psycopg_green()
+            self._pool_lock = threading.Lock()
+        
         @app.route('/api/healthcheck/db', methods=['GET'])
         def db_healthcheck():
             try:
                 self.get_connection()
-                return {'status': 'Database connection successful'}, 200
+                return {'status': 'Database connection successful', 'cooperative': self.cooperative,
+                        'pool': self.pool_stats()}, 200
             except Exception as e:
                 self.logger.error(f"Database connection failed: {str(e)}")
-                return {'status': 'Database connection failed', 'error': str(e)}, 500
+                return {'status': 'Database connection failed', 'error': str(e),
+                        'pool': self.pool_stats()}, 500
+    
+    def get_pool(self):
+        """Get the connection pool of the current worker process, creating it on first use"""
+        if self.pool is None or self.pool.pid != os.getpid():
+            with self._pool_lock:
+                if self.pool is None or self.pool.pid != os.getpid():
+                    config = current_app.config
+                    connect_kwargs = dict(
+                        host=config['DB_HOST'],
+                        port=config['DB_PORT'],
+                        dbname=config['DB_NAME'],
+                        user=config['DB_USER'],
+                        password=config['DB_PASSWORD'],
+                        cursor_factory=RealDictCursor
+                    )
+                    
+                    def connect():
+                        # Single statements run as their own implicit transaction, so
+                        # reads need no BEGIN/COMMIT round trips; see transaction()
+                        conn = psycopg2.connect(**connect_kwargs)
+                        conn.autocommit = True
+                        return conn
+                    
+                    self.pool = ConnectionPool(
+                        connect,
+                        min_size=config['DB_POOL_MIN_SIZE'],
+                        max_size=config['DB_POOL_MAX_SIZE'],
+                        timeout=config['DB_POOL_TIMEOUT'],
+                        max_uses=config['DB_POOL_MAX_USES'],
+                        max_age=config['DB_POOL_MAX_AGE'],
+                        pre_ping=config['DB_POOL_PRE_PING']
+                    )
+                    self.logger.debug(f"Database connection pool created for pid {os.getpid()}")
+        return self.pool
+    
+    def pool_stats(self):
+        """Get usage statistics of the current worker's connection pool"""
+        if self.pool is None or self.pool.pid != os.getpid():
+            return None
+        return self.pool.stats()
     
     def get_connection(self):
         """Get database connection"""
         if 'db' not in g:
             try:
-                g.db = psycopg2.connect(
-                    host=current_app.config['DB_HOST'],
-                    port=current_app.config['DB_PORT'],
-                    dbname=current_app.config['DB_NAME'],
-                    user=current_app.config['DB_USER'],
-                    password=current_app.config['DB_PASSWORD'],
-                    cursor_factory=RealDictCursor
-                )
-                self.logger.debug("Database connection established")
+                g.db = self.get_pool().acquire()
+                self.logger.debug("Database connection checked out")
             except Exception as e:
                 self.logger.error(f"Error connecting to database: {str(e)}")
                 raise
         return g.db
     
     def close_connection(self, e=None):
-        """Close database connection"""
+        """Return database connection to the pool"""
         db = g.pop('db', None)
+        g.pop('db_transaction', None)
         if db is not None:
-            db.close()
-            self.logger.debug("Database connection closed")
+            if not db.closed and not db.autocommit:
+                # A transaction was left open, e.g. by a stream the client abandoned
+                try:
+                    db.rollback()
+                    self._reset_session(db)
+                except Exception as e:
+                    self.logger.warning(f"Could not reset database session: {str(e)}")
+                    db.close()
+            if self.pool is not None and self.pool.pid == os.getpid():
+                self.pool.release(db)
+                self.logger.debug("Database connection returned to pool")
+            else:
+                db.close()
+                self.logger.debug("Database connection closed")
+    
+    def in_transaction(self):
+        """Check whether queries of the current request run inside transaction()"""
+        return g.get('db_transaction', False)
+    
+    @contextmanager
+    def transaction(self, read_only=False, isolation_level=None):
+        """
+        Run the enclosed queries in one transaction, committed on success and
+        rolled back on error. Nested blocks join the outermost transaction.
+        """
+        conn = self.get_connection()
+        if self.in_transaction():
+            yield conn
+            return
+        
+        conn.set_session(isolation_level=isolation_level or 'DEFAULT',
+                         readonly=True if read_only else 'DEFAULT', autocommit=False)
+        g.db_transaction = True
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            g.db_transaction = False
+            if not conn.closed:
+                self._reset_session(conn)
+    
+    def read_only_transaction(self):
+        """Run the enclosed reads in one REPEATABLE READ READ ONLY transaction, i.e. on one snapshot"""
+        return self.transaction(read_only=True, isolation_level=ISOLATION_LEVEL_REPEATABLE_READ)
+    
+    @staticmethod
+    def _reset_session(conn):
+        conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', autocommit=True)
+    
+    def _end_statement(self, conn, commit):
+        """Commit a statement run outside transaction(); a no-op on autocommit connections"""
+        if commit and not self.in_transaction():
+            conn.commit()
+    
+    def _abort_statement(self, conn):
+        """Roll back a failed statement unless the enclosing transaction() owns the rollback"""
+        if not self.in_transaction():
+            conn.rollback()
+    
+    @contextmanager
+    def _instrumented(self, operation, query, statement=None):
+        """
+        Time the enclosed statement, log it when slower than DB_SLOW_QUERY_MS and
+        report it to the metrics collector. The block stores its row count in the yielded dict.
+        """
+        observation = {'rows': 0}
+        started = time.perf_counter()
+        try:
+            yield observation
+        finally:
+            duration = time.perf_counter() - started
+            statement = statement or self.fingerprint(query)
+            slow_query_ms = current_app.config['DB_SLOW_QUERY_MS']
+            slow = bool(slow_query_ms) and duration * 1000 >= slow_query_ms
+            if slow:
+                self.logger.warning(f"Slow {operation} statement {statement} took {duration * 1000:.1f} ms: "
+                                    f"{' '.join(query.split())}")
+            if self.metrics is not None:
+                self.metrics.observe_query(operation, statement, duration, observation['rows'], slow)
+    
+    @staticmethod
+    def fingerprint(query):
+        """Get a short stable label for ad-hoc query text"""
+        return 'sql_' + hashlib.md5(' '.join(query.split()).encode('utf-8')).hexdigest()[:12]
+    
+    @staticmethod
+    def _fetch(cursor, fetchone, observation):
+        """Fetch the result of an executed statement, counting rows into observation"""
+        if not cursor.description:
+            observation['rows'] = max(cursor.rowcount, 0)
+            return None
+        if fetchone:
+            row = cursor.fetchone()
+            observation['rows'] = int(row is not None)
+            return row
+        rows = cursor.fetchall()
+        observation['rows'] = len(rows)
+        return rows
     
     def execute_query(self, query, params=None, fetchone=False):
         """Execute a database query and return results"""
+        return self._execute(query, params, fetchone, commit=True, operation='query')
+    
+    def execute_read(self, query, params=None, fetchone=False):
+        """Execute a read-only query without transaction control and return results"""
+        return self._execute(query, params, fetchone, commit=False, operation='read')
+    
+    def _execute(self, query, params, fetchone, commit, operation, statement=None):
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
             self.logger.debug(f"Executing query: {query} with params: {params}")
-            cursor.execute(query, params or ())
-            conn.commit()
-            
-            if cursor.description:
-                if fetchone:
-                    return cursor.fetchone()
-                return cursor.fetchall()
-            return None
+            with self._instrumented(operation, query, statement) as observation:
+                cursor.execute(query, params or ())
+                self._end_statement(conn, commit)
+                return self._fetch(cursor, fetchone, observation)
         except Exception as e:
-            conn.rollback()
+            self._abort_statement(conn)
             self.logger.error(f"Query execution error: {str(e)}")
             raise
         finally:
             cursor.close()
     
+    def register_statement(self, name, query):
+        """Declare a named statement that is prepared once per connection and run with EXECUTE"""
+        registered = self.statements.get(name)
+        if registered is not None:
+            if registered['query'] != query:
+                raise ValueError(f"Statement {name} is already registered with a different query")
+            return name
+        
+        counter = iter(range(1, query.count('%s') + 1))
+        server_query = PLACEHOLDER_PATTERN.sub(
+            lambda match: f"${next(counter)}" if match.group(1) == 's' else '%', query
+        )
+        self.statements[name] = {
+            'query': query,
+            'server_query': server_query,
+            'param_count': query.count('%s')
+        }
+        return name
+    
+    def execute_prepared(self, name, params=None, fetchone=False):
+        """
+        Execute a registered read-only statement, preparing it first on connections
+        that have not seen it
+        """
+        statement = self.statements[name]
+        if not current_app.config['DB_PREPARED_STATEMENTS']:
+            return self._execute(statement['query'], params, fetchone, commit=False, operation='read',
+                                 statement=name)
+        
+        conn = self.get_connection()
+        prepared = self._prepared.setdefault(conn, set())
+        placeholders = ', '.join(['%s'] * statement['param_count'])
+        execute_sql = f"EXECUTE {name} ({placeholders})" if placeholders else f"EXECUTE {name}"
+        
+        for attempt in range(2):
+            cursor = conn.cursor()
+            try:
+                if name not in prepared:
+                    self.logger.debug(f"Preparing statement {name}: {statement['server_query']}")
+                    cursor.execute(f"PREPARE {name} AS {statement['server_query']}")
+                    prepared.add(name)
+                
+                self.logger.debug(f"Executing prepared statement {name} with params: {params}")
+                with self._instrumented('prepared', statement['query'], name) as observation:
+                    cursor.execute(execute_sql, params or ())
+                    return self._fetch(cursor, fetchone, observation)
+            except psycopg2.errors.InvalidSqlStatementName:
+                # The server forgot the statement (e.g. DISCARD ALL or a server-side reset)
+                self._abort_statement(conn)
+                prepared.discard(name)
+                # An aborted transaction() cannot run the retry
+                if attempt or self.in_transaction():
+                    raise
+                self.logger.warning(f"Prepared statement {name} missing on connection, re-preparing")
+            except psycopg2.errors.DuplicatePreparedStatement:
+                self._abort_statement(conn)
+                prepared.add(name)
+                if attempt or self.in_transaction():
+                    raise
+            except Exception as e:
+                self._abort_statement(conn)
+                self.logger.error(f"Prepared statement execution error: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+    
+    def stream_query(self, query, params=None, batch_size=None):
+        """
+        Execute a query through a server-side cursor and yield result rows in batches.
+        Named cursors need a transaction, so the rows are read in read_only_transaction().
+        """
+        batch_size = batch_size or current_app.config['DB_STREAM_BATCH_SIZE']
+        with self.read_only_transaction() as conn:
+            cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+            cursor.itersize = batch_size
+            try:
+                self.logger.debug(f"Streaming query: {query} with params: {params}")
+                # Covers the whole stream, including the time the client takes to read it
+                with self._instrumented('stream', query) as observation:
+                    cursor.execute(query, params or ())
+                    
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        observation['rows'] += len(rows)
+                        yield rows
+            except GeneratorExit:
+                raise
+            except Exception as e:
+                self.logger.error(f"Query streaming error: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+    
     def execute_many(self, query, params_list):
-        """Execute a query with multiple parameter sets"""
+        """Execute a query with multiple parameter sets in one transaction"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            try:
+                self.logger.debug(f"Executing many query: {query}")
+                with self._instrumented('many', query) as observation:
+                    cursor.executemany(query, params_list)
+                    observation['rows'] = max(cursor.rowcount, 0)
+                return cursor.rowcount
+            except Exception as e:
+                self.logger.error(f"Query executemany error: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+    
+    @staticmethod
+    def _copy_text(rows):
+        """Render rows in the text format of COPY"""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(
+                '\\N' if value is None else
+                str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+                for value in row
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
+        return buffer
+    
+    def copy_rows(self, table, columns, rows):
+        """Load rows into a table with COPY FROM STDIN and return the number of rows copied"""
+        if self.cooperative:
+            raise RuntimeError("COPY is not supported with the gevent wait callback installed; "
+                               "run bulk imports outside the gevent workers, e.g. with flask import-geojson")
         conn = self.get_connection()
         cursor = conn.cursor()
+        query = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
         try:
-            self.logger.debug(f"Executing many query: {query}")
-            cursor.executemany(query, params_list)
-            conn.commit()
+            buffer = self._copy_text(rows)
+            self.logger.debug(f"Copying rows: {query}")
+            with self._instrumented('copy', query) as observation:
+                cursor.copy_expert(query, buffer)
+                observation['rows'] = max(cursor.rowcount, 0)
+                self._end_statement(conn, commit=True)
             return cursor.rowcount
         except Exception as e:
-            conn.rollback()
-            self.logger.error(f"Query executemany error: {str(e)}")
+            self._abort_statement(conn)
+            self.logger.error(f"Copy error: {str(e)}")
             raise
         finally:
             cursor.close()
@@ -96,14 +394,12 @@ class DBManager:
             query = f"CALL {procedure_name}({param_placeholders})"
             
             self.logger.debug(f"Calling procedure: {query} with params: {params}")
-            cursor.execute(query, params or ())
-            conn.commit()
-            
-            if cursor.description:
-                return cursor.fetchall()
-            return None
+            with self._instrumented('procedure', query, procedure_name) as observation:
+                cursor.execute(query, params or ())
+                self._end_statement(conn, commit=True)
+                return self._fetch(cursor, False, observation)
         except Exception as e:
-            conn.rollback()
+            self._abort_statement(conn)
             self.logger.error(f"Procedure call error: {str(e)}")
             raise
         finally:
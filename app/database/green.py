@@ -0,0 +1,61 @@
+"""
+Cooperative database I/O module.
+Makes psycopg2 yield to other greenlets while it waits for PostgreSQL, so a
+gevent worker keeps serving requests during queries.
+"""
+import logging
+
+import psycopg2
+from psycopg2 import extensions
+
+try:
+    from gevent import monkey
+    from gevent.socket import wait_read, wait_write
+except ImportError:
+    monkey = None
+
+logger = logging.getLogger(__name__)
+
+
+def is_gevent_patched():
+    """Check whether the process runs under gevent with the standard library monkey-patched"""
+    return monkey is not None and monkey.is_module_patched('threading') and monkey.is_module_patched('socket')
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """
+    Wait for a psycopg2 connection without blocking the other greenlets.
+    psycopg2 calls this whenever a statement would block on the socket.
+
+    Args:
+        conn: psycopg2 connection in asynchronous mode
+        timeout: Optional seconds to wait for the socket
+    """
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+
+def make_psycopg_green():
+    """
+    Install the gevent wait callback for every psycopg2 connection of the process.
+    COPY does not work with the callback installed: psycopg2 raises
+    ProgrammingError "copy_expert cannot be used with an asynchronous callback",
+    so bulk imports have to run in a process without it, e.g. the flask CLI.
+
+    Returns:
+        True if the callback is installed, False if gevent is not available
+    """
+    if monkey is None:
+        return False
+    if extensions.get_wait_callback() is not gevent_wait_callback:
+        extensions.set_wait_callback(gevent_wait_callback)
+        logger.info("Installed the gevent wait callback for psycopg2")
+    return True
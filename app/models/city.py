@@ -1,21 +1,25 @@
-from app import db
+from app import db, reference_cache
 
 class City:
     @staticmethod
+    @reference_cache.cached('city')
     def get_all():
         """Get all cities"""
         query = "SELECT id, name, name_ru FROM City"
-        return db.execute_query(query)
+        return db.execute_prepared(db.register_statement('city_get_all', query))
     
     @staticmethod
+    @reference_cache.cached('city')
     def get_by_id(city_id):
         """Get city by ID"""
         query = "SELECT * FROM City WHERE id = %s"
-        return db.execute_query(query, (city_id,), fetchone=True)
+        return db.execute_prepared(db.register_statement('city_get_by_id', query), (city_id,), fetchone=True)
     
     @staticmethod
     def create(name):
         """Create a new city"""
         query = "INSERT INTO City (name) VALUES (%s) RETURNING id, name"
-        return db.execute_query(query, (name,), fetchone=True)
+        city = db.execute_query(query, (name,), fetchone=True)
+        reference_cache.invalidate('city')
+        return city
 
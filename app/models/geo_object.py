@@ -1,34 +1,515 @@
-from app import db
+import hashlib
+import json
+import psycopg2
+from app import db, reference_cache
+
+# Objects whose extent is below the tolerance on both axes vanish at that scale
+TINY_GEOMETRY_SQL = """(ST_Dimension(g.location) > 0
+                  AND ST_XMax(g.location) - ST_XMin(g.location) < %s
+                  AND ST_YMax(g.location) - ST_YMin(g.location) < %s)"""
+
+# Whether this process has made sure the SimulationRevision table exists
+_revision_schema_ready = False
 
 class GeoObject:
     @staticmethod
-    def get_by_simulation(simulation_id, bbox=None):
-        """Get geographic objects for a specific simulation with optional bounding box"""
-        params = [simulation_id]
+    def _simulation_source(simulation_id, bbox=None, lod_level=None, tolerance=None, precision=None,
+                           after_id=None, limit=None):
+        """
+        Build the GeoJSON geometry expression and FROM/WHERE clauses selecting the
+        objects of a simulation at the requested level of detail and precision.
+        With limit, a keyset page of objects with IDs above after_id is selected.
+        Returns (geometry_sql, geometry_params, source_sql, source_params).
+        """
+        geometry = "g.location"
+        geometry_params = []
+        params = []
         
-        query = """
-            SELECT g.id, g.name, g.role, g.description, 
-                   ST_AsGeoJSON(g.location) as geometry
+        source = """
             FROM GeoObject g
             JOIN GeoObjectSimulation gs ON g.id = gs.geo_object_id
-            WHERE gs.simulation_id = %s
         """
         
+        if lod_level is not None:
+            geometry = "COALESCE(l.location, g.location)"
+            source += "    LEFT JOIN GeoObjectLOD l ON l.geo_object_id = g.id AND l.zoom = %s\n"
+            params.append(lod_level)
+        elif tolerance:
+            geometry = "ST_SimplifyPreserveTopology(g.location, %s)"
+            geometry_params.append(tolerance)
+        
+        if precision is not None:
+            geometry = f"ST_AsGeoJSON({geometry}, %s)"
+            geometry_params.append(precision)
+        else:
+            geometry = f"ST_AsGeoJSON({geometry})"
+        
+        source += "            WHERE gs.simulation_id = %s"
+        params.append(simulation_id)
+        
+        if lod_level is not None:
+            source += " AND l.dropped IS NOT TRUE"
+        elif tolerance:
+            source += f" AND NOT {TINY_GEOMETRY_SQL}"
+            params.extend([tolerance, tolerance])
+        
         if bbox:
             minx, miny, maxx, maxy = bbox
-            query += " AND ST_Intersects(g.location, ST_MakeEnvelope(%s, %s, %s, %s, 4326))"
+            source += " AND ST_Intersects(g.location, ST_MakeEnvelope(%s, %s, %s, %s, 4326))"
             params.extend([minx, miny, maxx, maxy])
         
-        return db.execute_query(query, params)
+        if after_id is not None:
+            source += " AND g.id > %s"
+            params.append(after_id)
+        
+        if limit is not None:
+            source += " ORDER BY g.id LIMIT %s"
+            params.append(limit)
+        
+        return geometry, geometry_params, source, params
     
     @staticmethod
-    def get_by_id(geo_object_id):
-        """Get geographic object by ID"""
+    def _simulation_query(simulation_id, bbox=None, lod_level=None, tolerance=None, precision=None,
+                          after_id=None, limit=None):
+        """Build the query and parameters selecting the objects of a simulation"""
+        geometry, geometry_params, source, source_params = GeoObject._simulation_source(
+            simulation_id, bbox, lod_level, tolerance, precision, after_id, limit
+        )
+        
+        query = f"""
+            SELECT g.id, g.name, g.role, g.description, 
+                   {geometry} as geometry
+            {source}
+        """
+        
+        return query, geometry_params + source_params
+    
+    @staticmethod
+    def get_by_simulation(simulation_id, bbox=None, lod_level=None, tolerance=None, precision=None,
+                          after_id=None, limit=None):
+        """
+        Get geographic objects for a specific simulation with optional bounding box.
+        Geometry is taken from the precomputed LOD variant for lod_level, or
+        simplified on the fly with tolerance (in degrees), and encoded with at
+        most precision decimal digits. With limit, only the page of objects
+        following after_id in ID order is fetched.
+        """
+        query, params = GeoObject._simulation_query(simulation_id, bbox, lod_level, tolerance, precision,
+                                                    after_id, limit)
+        # Each combination of options yields a distinct query text, prepared under its own name
+        name = 'geo_object_get_by_simulation_' + hashlib.md5(query.encode('utf-8')).hexdigest()[:12]
+        return db.execute_prepared(db.register_statement(name, query), params)
+    
+    @staticmethod
+    def iter_by_simulation(simulation_id, bbox=None, batch_size=None, lod_level=None, tolerance=None,
+                           precision=None):
+        """Iterate over batches of geographic objects for a simulation using a server-side cursor"""
+        query, params = GeoObject._simulation_query(simulation_id, bbox, lod_level, tolerance, precision)
+        return db.stream_query(query, params, batch_size)
+    
+    @staticmethod
+    def iter_index_rows(simulation_id, batch_size=None):
+        """
+        Iterate over batches of the objects of a simulation in ID order, with their
+        full-detail GeoJSON geometry and bounding box (minx, miny, maxx, maxy)
+        """
+        query = """
+            SELECT g.id, g.name, g.role, g.description,
+                   ST_AsGeoJSON(g.location) as geometry,
+                   ST_XMin(g.location) as minx, ST_YMin(g.location) as miny,
+                   ST_XMax(g.location) as maxx, ST_YMax(g.location) as maxy
+            FROM GeoObject g
+            JOIN GeoObjectSimulation gs ON g.id = gs.geo_object_id
+            WHERE gs.simulation_id = %s
+            ORDER BY g.id
+        """
+        return db.stream_query(query, (simulation_id,), batch_size)
+    
+    @staticmethod
+    def get_feature_collection_json(simulation_id, bbox=None, lod_level=None, tolerance=None, precision=None,
+                                    after_id=None, limit=None):
+        """
+        Get the GeoJSON FeatureCollection of a simulation assembled by PostgreSQL.
+        Returns a row with the document as JSON text (geojson), the number of
+        features (count) and the highest object ID (last_id), or None if the
+        simulation does not exist.
+        """
+        geometry, geometry_params, source, source_params = GeoObject._simulation_source(
+            simulation_id, bbox, lod_level, tolerance, precision, after_id, limit
+        )
+        params = [json.dumps(bbox) if bbox else None] + geometry_params + source_params + [simulation_id]
+        
+        query = f"""
+            SELECT json_build_object(
+                'type', 'FeatureCollection',
+                'features', COALESCE(f.features, '[]'::json),
+                'metadata', json_build_object(
+                    'simulation_id', s.id,
+                    'year', s.year,
+                    'city', c.name,
+                    'mode', m.name,
+                    'count', COALESCE(f.count, 0),
+                    'bbox', %s::json
+                )
+            )::text as geojson,
+            COALESCE(f.count, 0) as count,
+            f.last_id
+            FROM Simulation s
+            JOIN City c ON s.city_id = c.id
+            JOIN Mode m ON s.mode_id = m.id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(p.feature ORDER BY p.id) as features,
+                       count(*) as count,
+                       max(p.id) as last_id
+                FROM (
+                    SELECT g.id,
+                           json_build_object(
+                               'type', 'Feature',
+                               'geometry', {geometry}::json,
+                               'properties', json_build_object(
+                                   'id', g.id,
+                                   'name', g.name,
+                                   'role', g.role,
+                                   'description', g.description
+                               )
+                           ) as feature
+                    {source}
+                ) p
+            ) f ON true
+            WHERE s.id = %s
+        """
+        
+        return db.execute_read(query, params, fetchone=True)
+    
+    @staticmethod
+    def get_diff(from_simulation_id, to_simulation_id, precision=None):
+        """
+        Get the objects that differ between two simulations, computed over GeoObjectSimulation.
+        Rows have a change of 'added', 'removed' or 'changed'; a changed object replaces
+        the removed object with the same name and role (previous_id).
+        Geometry is only returned for added and changed objects.
+        """
+        if precision is not None:
+            geometry, params = "ST_AsGeoJSON(g.location, %s)", [from_simulation_id, to_simulation_id, precision, precision]
+        else:
+            geometry, params = "ST_AsGeoJSON(g.location)", [from_simulation_id, to_simulation_id]
+        
+        query = f"""
+            WITH before AS (
+                SELECT geo_object_id FROM GeoObjectSimulation WHERE simulation_id = %s
+            ),
+            after AS (
+                SELECT geo_object_id FROM GeoObjectSimulation WHERE simulation_id = %s
+            ),
+            removed AS (
+                SELECT geo_object_id as id FROM before
+                EXCEPT
+                SELECT geo_object_id FROM after
+            ),
+            added AS (
+                SELECT geo_object_id as id FROM after
+                EXCEPT
+                SELECT geo_object_id FROM before
+            ),
+            changed AS (
+                SELECT max(x.id) FILTER (WHERE x.side = 'added') as id,
+                       max(x.id) FILTER (WHERE x.side = 'removed') as previous_id
+                FROM (
+                    SELECT 'added' as side, g.id, g.name, g.role
+                    FROM added JOIN GeoObject g ON g.id = added.id
+                    UNION ALL
+                    SELECT 'removed' as side, g.id, g.name, g.role
+                    FROM removed JOIN GeoObject g ON g.id = removed.id
+                ) x
+                WHERE x.name IS NOT NULL
+                GROUP BY x.name, x.role
+                HAVING count(*) FILTER (WHERE x.side = 'added') = 1
+                   AND count(*) FILTER (WHERE x.side = 'removed') = 1
+            )
+            SELECT 'added' as change, g.id, NULL::integer as previous_id,
+                   g.name, g.role, g.description, {geometry} as geometry
+            FROM added
+            JOIN GeoObject g ON g.id = added.id
+            WHERE added.id NOT IN (SELECT id FROM changed)
+            UNION ALL
+            SELECT 'changed' as change, g.id, changed.previous_id,
+                   g.name, g.role, g.description, {geometry} as geometry
+            FROM changed
+            JOIN GeoObject g ON g.id = changed.id
+            UNION ALL
+            SELECT 'removed' as change, removed.id, NULL::integer as previous_id,
+                   NULL, NULL, NULL, NULL
+            FROM removed
+            WHERE removed.id NOT IN (SELECT previous_id FROM changed)
+            ORDER BY change, id
+        """
+        return db.execute_read(query, params)
+    
+    @staticmethod
+    def get_tile(simulation_id, z, x, y, extent=4096, buffer=64):
+        """Get a Mapbox Vector Tile with the objects of a simulation inside tile z/x/y"""
+        query = """
+            WITH bounds AS (
+                SELECT ST_TileEnvelope(%s, %s, %s) as geom
+            ),
+            mvtgeom AS (
+                SELECT ST_AsMVTGeom(ST_Transform(g.location, 3857), bounds.geom, %s, %s, true) as geom,
+                       g.id, g.name, g.role
+                FROM GeoObject g
+                JOIN GeoObjectSimulation gs ON g.id = gs.geo_object_id
+                CROSS JOIN bounds
+                WHERE gs.simulation_id = %s
+                  AND ST_Intersects(g.location, ST_Transform(bounds.geom, 4326))
+            )
+            SELECT ST_AsMVT(mvtgeom.*, 'geo_objects', %s, 'geom', 'id') as tile
+            FROM mvtgeom
+        """
+        params = (z, x, y, extent, buffer, simulation_id, extent)
+        result = db.execute_read(query, params, fetchone=True)
+        return bytes(result['tile']) if result and result['tile'] is not None else b''
+    
+    @staticmethod
+    def ensure_lod_schema():
+        """Create the table holding precomputed level-of-detail geometry if it does not exist"""
+        query = """
+            CREATE TABLE IF NOT EXISTS GeoObjectLOD (
+                geo_object_id INTEGER NOT NULL REFERENCES GeoObject(id) ON DELETE CASCADE,
+                zoom SMALLINT NOT NULL,
+                location geometry,
+                dropped BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (geo_object_id, zoom)
+            )
+        """
+        db.execute_query(query)
+    
+    @staticmethod
+    @reference_cache.cached('geo_object_lod')
+    def has_lod(simulation_id, zoom):
+        """Check whether LOD geometry of a zoom level has been built for the objects of a simulation"""
+        table = db.execute_read("SELECT to_regclass('geoobjectlod') IS NOT NULL as exists", fetchone=True)
+        if not table['exists']:
+            return False
+        
+        query = """
+            SELECT EXISTS (
+                SELECT 1
+                FROM GeoObjectLOD l
+                JOIN GeoObjectSimulation gs ON gs.geo_object_id = l.geo_object_id
+                WHERE gs.simulation_id = %s AND l.zoom = %s
+            ) as available
+        """
+        return db.execute_read(query, (simulation_id, zoom), fetchone=True)['available']
+    
+    @staticmethod
+    def build_lod(zoom, tolerance, simulation_id=None):
+        """
+        Precompute topology-preserving simplified geometry of lines and polygons
+        for one zoom level. Objects smaller than the tolerance are marked as dropped.
+        Restricted to the objects of one simulation when simulation_id is given.
+        """
+        params = [zoom, tolerance, tolerance, tolerance]
+        
+        query = f"""
+            INSERT INTO GeoObjectLOD (geo_object_id, zoom, location, dropped)
+            SELECT g.id, %s,
+                   CASE WHEN t.tiny THEN NULL ELSE ST_SimplifyPreserveTopology(g.location, %s) END,
+                   t.tiny
+            FROM GeoObject g
+            CROSS JOIN LATERAL (SELECT {TINY_GEOMETRY_SQL} as tiny) t
+            WHERE ST_Dimension(g.location) > 0
+        """
+        
+        if simulation_id is not None:
+            query += " AND g.id IN (SELECT geo_object_id FROM GeoObjectSimulation WHERE simulation_id = %s)"
+            params.append(simulation_id)
+        
+        query += """
+            ON CONFLICT (geo_object_id, zoom)
+            DO UPDATE SET location = EXCLUDED.location, dropped = EXCLUDED.dropped
+        """
+        
+        db.execute_query(query, params)
+    
+    @staticmethod
+    def create_import_staging():
+        """Create the temporary table that bulk imports are copied into; dropped on commit"""
         query = """
+            CREATE TEMP TABLE geo_object_import (
+                seq INTEGER NOT NULL,
+                name TEXT,
+                role TEXT,
+                description TEXT,
+                geometry TEXT NOT NULL,
+                location geometry,
+                object_id INTEGER,
+                is_new BOOLEAN NOT NULL DEFAULT FALSE
+            ) ON COMMIT DROP
+        """
+        db.execute_query(query)
+    
+    @staticmethod
+    def stage_import_rows(rows):
+        """Copy (seq, name, role, description, GeoJSON geometry) rows into the import staging table"""
+        return db.copy_rows('geo_object_import', ('seq', 'name', 'role', 'description', 'geometry'), rows)
+    
+    @staticmethod
+    def merge_import(simulation_id, city_id):
+        """
+        Turn staged rows into GeoObject rows linked to a simulation. Objects of earlier
+        simulations of the same city with identical name, role, description and
+        geometry are reused; duplicates within the import share one new object.
+        Returns a row with the staged, reused, inserted and linked counts.
+        """
+        db.execute_query("""
+            UPDATE geo_object_import SET location = ST_SetSRID(ST_GeomFromGeoJSON(geometry), 4326)
+        """)
+        db.execute_query("CREATE INDEX ON geo_object_import USING GIST (location)")
+        db.execute_query("ANALYZE geo_object_import")
+        
+        db.execute_query("""
+            UPDATE geo_object_import i SET object_id = m.id
+            FROM (
+                SELECT DISTINCT ON (i.seq) i.seq, g.id
+                FROM geo_object_import i
+                JOIN GeoObject g ON g.location && i.location
+                                AND ST_AsBinary(g.location) = ST_AsBinary(i.location)
+                                AND g.name IS NOT DISTINCT FROM i.name
+                                AND g.role IS NOT DISTINCT FROM i.role
+                                AND g.description IS NOT DISTINCT FROM i.description
+                JOIN GeoObjectSimulation gs ON gs.geo_object_id = g.id
+                JOIN Simulation s ON s.id = gs.simulation_id
+                WHERE s.city_id = %s
+                ORDER BY i.seq, g.id
+            ) m
+            WHERE i.seq = m.seq
+        """, (city_id,))
+        
+        db.execute_query("""
+            WITH groups AS (
+                SELECT array_agg(seq) as seqs
+                FROM geo_object_import
+                WHERE object_id IS NULL
+                GROUP BY name, role, description, ST_AsBinary(location)
+            ),
+            allocated AS (
+                SELECT nextval(pg_get_serial_sequence('GeoObject', 'id')) as id, seqs FROM groups
+            ),
+            members AS (
+                SELECT id, unnest(seqs) as seq FROM allocated
+            )
+            UPDATE geo_object_import i SET object_id = members.id, is_new = TRUE
+            FROM members
+            WHERE i.seq = members.seq
+        """)
+        
+        db.execute_query("""
+            INSERT INTO GeoObject (id, name, role, description, location)
+            SELECT DISTINCT ON (object_id) object_id, name, role, description, location
+            FROM geo_object_import
+            WHERE is_new
+            ORDER BY object_id, seq
+        """)
+        
+        query = """
+            WITH linked AS (
+                INSERT INTO GeoObjectSimulation (geo_object_id, simulation_id)
+                SELECT DISTINCT object_id, %s FROM geo_object_import
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM geo_object_import) as staged,
+                   (SELECT count(DISTINCT object_id) FROM geo_object_import WHERE NOT is_new) as reused,
+                   (SELECT count(DISTINCT object_id) FROM geo_object_import WHERE is_new) as inserted,
+                   (SELECT count(*) FROM linked) as linked
+        """
+        return db.execute_query(query, (simulation_id,), fetchone=True)
+    
+    @staticmethod
+    def ensure_revision_schema():
+        """Create the table holding the content revision of every simulation if it does not exist"""
+        global _revision_schema_ready
+        if _revision_schema_ready:
+            return
+        
+        query = """
+            CREATE TABLE IF NOT EXISTS SimulationRevision (
+                simulation_id INTEGER PRIMARY KEY REFERENCES Simulation(id) ON DELETE CASCADE,
+                revision TEXT NOT NULL
+            )
+        """
+        try:
+            db.execute_query(query)
+        except psycopg2.IntegrityError:
+            # Another worker created the table at the same moment
+            pass
+        _revision_schema_ready = True
+    
+    @staticmethod
+    def get_simulation_version(simulation_id):
+        """
+        Get the content version of the geographic objects linked to a simulation.
+        It is a revision token replaced by every write to the objects, read with one
+        primary key lookup, so it is cheap enough for every conditional request.
+        It is not cached: a cached value would let other workers serve stale ETags,
+        tiles and snapshots after a write. Simulations never written through the
+        application have version '0'; data loaded by other means has to be followed
+        by flask bump-versions.
+        """
+        GeoObject.ensure_revision_schema()
+        query = "SELECT revision FROM SimulationRevision WHERE simulation_id = %s"
+        result = db.execute_prepared(db.register_statement('geo_object_get_simulation_version', query),
+                                     (simulation_id,), fetchone=True)
+        return result['revision'] if result else '0'
+    
+    @staticmethod
+    def bump_simulation_version(simulation_id=None):
+        """
+        Give a simulation, or all simulations, a new content version.
+        Called by the writes to geographic objects inside their transaction,
+        so the new version becomes visible together with the new objects.
+        """
+        GeoObject.ensure_revision_schema()
+        query = """
+            INSERT INTO SimulationRevision (simulation_id, revision)
+            SELECT s.id, md5(random()::text || clock_timestamp()::text)
+            FROM Simulation s
+        """
+        params = []
+        if simulation_id is not None:
+            query += " WHERE s.id = %s"
+            params.append(simulation_id)
+        query += " ON CONFLICT (simulation_id) DO UPDATE SET revision = EXCLUDED.revision"
+        db.execute_query(query, params)
+    
+    @staticmethod
+    def get_by_id(geo_object_id, precision=None):
+        """Get geographic object by ID"""
+        if precision is not None:
+            geometry, params = "ST_AsGeoJSON(g.location, %s)", (precision, geo_object_id)
+        else:
+            geometry, params = "ST_AsGeoJSON(g.location)", (geo_object_id,)
+        
+        query = f"""
             SELECT g.id, g.name, g.role, g.description, 
-                   ST_AsGeoJSON(g.location) as geometry
+                   {geometry} as geometry
             FROM GeoObject g
             WHERE g.id = %s
         """
-        return db.execute_query(query, (geo_object_id,), fetchone=True)
+        return db.execute_read(query, params, fetchone=True)
+    
+    @staticmethod
+    def get_by_ids(geo_object_ids, precision=None):
+        """Get geographic objects by a list of IDs in a single query"""
+        if precision is not None:
+            geometry, params = "ST_AsGeoJSON(g.location, %s)", (precision, list(geo_object_ids))
+        else:
+            geometry, params = "ST_AsGeoJSON(g.location)", (list(geo_object_ids),)
+        
+        query = f"""
+            SELECT g.id, g.name, g.role, g.description, 
+                   {geometry} as geometry
+            FROM GeoObject g
+            WHERE g.id = ANY(%s)
+        """
+        return db.execute_read(query, params)
 
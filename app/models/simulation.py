@@ -1,18 +1,32 @@
-from app import db
+from app import db, reference_cache
 
 class Simulation:
     @staticmethod
-    def get_all():
-        """Get all simulations"""
+    def get_all(after_id=None, limit=None):
+        """Get all simulations, or with limit only the page following after_id in ID order"""
+        params = []
+        
         query = """
             SELECT s.id, s.year, c.name as city_name, m.name as mode_name
             FROM Simulation s
             JOIN City c ON s.city_id = c.id
             JOIN Mode m ON s.mode_id = m.id
         """
-        return db.execute_query(query)
+        
+        if after_id is not None:
+            query += " WHERE s.id > %s"
+            params.append(after_id)
+        
+        query += " ORDER BY s.id"
+        
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        
+        return db.execute_read(query, params)
     
     @staticmethod
+    @reference_cache.cached('simulation')
     def get_by_id(simulation_id):
         """Get simulation by ID"""
         query = """
@@ -22,7 +36,8 @@ class Simulation:
             JOIN Mode m ON s.mode_id = m.id
             WHERE s.id = %s
         """
-        return db.execute_query(query, (simulation_id,), fetchone=True)
+        return db.execute_prepared(db.register_statement('simulation_get_by_id', query),
+                                   (simulation_id,), fetchone=True)
     
     @staticmethod
     def get_by_city_year(city_id, year, mode_id):
@@ -34,9 +49,22 @@ class Simulation:
             JOIN Mode m ON s.mode_id = m.id
             WHERE s.city_id = %s AND s.year = %s AND s.mode_id = %s
         """
-        return db.execute_query(query, (city_id, year, mode_id), fetchone=True)
+        return db.execute_prepared(db.register_statement('simulation_get_by_city_year', query),
+                                   (city_id, year, mode_id), fetchone=True)
     
     @staticmethod
+    def create(city_id, year, mode_id):
+        """Create a new simulation"""
+        query = """
+            INSERT INTO Simulation (city_id, year, mode_id) VALUES (%s, %s, %s)
+            RETURNING id, city_id, year, mode_id
+        """
+        simulation = db.execute_query(query, (city_id, year, mode_id), fetchone=True)
+        reference_cache.invalidate('simulation')
+        return simulation
+    
+    @staticmethod
+    @reference_cache.cached('simulation')
     def get_years_by_city(city_id):
         """Get all available years for a city"""
         query = """
@@ -45,17 +73,31 @@ class Simulation:
             WHERE city_id = %s
             ORDER BY year
         """
-        result = db.execute_query(query, (city_id,))
+        result = db.execute_prepared(db.register_statement('simulation_get_years_by_city', query), (city_id,))
         return [record['year'] for record in result]
 
     @staticmethod
+    @reference_cache.cached('simulation')
+    def get_timeline_by_city(city_id):
+        """Get the first simulation of every year for a city, preferring the lowest mode ID"""
+        query = """
+            SELECT DISTINCT ON (s.year) s.year, s.id as simulation_id
+            FROM Simulation s
+            JOIN Mode m ON s.mode_id = m.id
+            WHERE s.city_id = %s
+            ORDER BY s.year, m.id, s.id
+        """
+        return db.execute_prepared(db.register_statement('simulation_get_timeline_by_city', query), (city_id,))
+
+    @staticmethod
+    @reference_cache.cached('mode')
     def get_modes():
         """Get all available modes"""
         query = """
             SELECT id
             FROM Mode
         """
-        result = db.execute_query(query, ())
+        result = db.execute_prepared(db.register_statement('mode_get_all_ids', query))
         return [record['id'] for record in result]
 
 
@@ -1,10 +1,12 @@
 from flask import Blueprint, jsonify, request, Response
 from app.models.city import City
 from app.services.city_service import CityService
+from app.utils import conditional_response
 
 city_bp = Blueprint('city', __name__)
 
 @city_bp.route('/', methods=['GET'])
+@conditional_response
 def get_cities():
     """Get all cities"""
     cities = City.get_all()
@@ -12,6 +14,7 @@ def get_cities():
 
 
 @city_bp.route('/<int:city_id>', methods=['GET'])
+@conditional_response
 def get_city(city_id):
     """Get city by ID"""
     city = City.get_by_id(city_id)
@@ -1,11 +1,67 @@
-from flask import Blueprint, jsonify, request
+import math
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context, send_file
+from app import coalescer, compression
 from app.models import GeoObject
-from app.services import GeoObjectService
-from app.utils import validate_bbox, create_error_response, create_success_response
-import json
+from app.services import GeoObjectService, SnapshotService
+from app.utils import validate_bbox, create_error_response, create_success_response, create_raw_success_response, \
+    compute_etag, check_not_modified, conditional_response, get_keyset_page_args, create_page_meta, raw_json
+from app.utils.compression_utils import etag_variant
+from app.utils.geobuf import GEOBUF_MIMETYPE, DEFAULT_PRECISION
 
 geo_object_bp = Blueprint('geo_object', __name__)
 
+GEOBUF_MIMETYPES = (GEOBUF_MIMETYPE, 'application/x-protobuf')
+MAX_PRECISION = 15
+
+
+def _get_precision():
+    """Read the optional precision query parameter; returns (precision, error_response)"""
+    precision = request.args.get('precision', type=int)
+    if 'precision' in request.args and (precision is None or not 0 <= precision <= MAX_PRECISION):
+        return None, create_error_response("Invalid coordinate precision", 400)
+    return precision, None
+
+
+def _get_detail():
+    """Read the optional zoom and tolerance query parameters; returns (zoom, tolerance, error_response)"""
+    zoom = request.args.get('zoom', type=int)
+    if 'zoom' in request.args and (zoom is None or not 0 <= zoom <= current_app.config['TILE_MAX_ZOOM']):
+        return None, None, create_error_response("Invalid zoom level", 400)
+
+    tolerance = request.args.get('tolerance', type=float)
+    if 'tolerance' in request.args and (tolerance is None or not math.isfinite(tolerance) or tolerance <= 0):
+        return None, None, create_error_response("Invalid simplification tolerance", 400)
+    return zoom, tolerance, None
+
+
+def _negotiate_format():
+    """Pick the response format from the Accept header: 'json' or 'geobuf'"""
+    best = request.accept_mimetypes.best_match(('application/json', 'application/geo+json') + GEOBUF_MIMETYPES)
+    return 'geobuf' if best in GEOBUF_MIMETYPES else 'json'
+
+
+def _send_snapshot(simulation_id, version):
+    """Serve a whole simulation from its precomputed snapshot file; returns None when there is none"""
+    etag = compute_etag('geo-objects-snapshot', simulation_id, version)
+    not_modified = check_not_modified(etag)
+    if not_modified:
+        return not_modified
+
+    encoding = compression.negotiate() if compression.enabled else None
+    snapshot = SnapshotService.get_snapshot(simulation_id, version, [encoding] if encoding else [])
+    if snapshot is None:
+        return None
+
+    # The file is handed to the WSGI server as is (sendfile where supported), never read into memory
+    path, encoding = snapshot
+    response = send_file(path, mimetype='application/json', conditional=False, etag=False)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        etag = etag_variant(etag, encoding)
+    response.set_etag(etag)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
 
 @geo_object_bp.route('/simulation/<int:simulation_id>', methods=['GET'])
 def get_geo_objects_by_simulation(simulation_id):
@@ -22,27 +78,201 @@ def get_geo_objects_by_simulation(simulation_id):
         if not validate_bbox(bbox):
             return create_error_response("Invalid bounding box parameters", 400)
 
+    zoom, tolerance, error = _get_detail()
+    if error:
+        return error
+
+    precision, error = _get_precision()
+    if error:
+        return error
+
+    try:
+        after_id, limit = get_keyset_page_args()
+    except ValueError as e:
+        return create_error_response(str(e), 400)
+
+    stream = request.args.get('stream', '').lower() in ('1', 'true')
+    if stream and limit is not None:
+        return create_error_response("Pagination is not supported for streamed responses", 400)
+
+    response_format = _negotiate_format()
+
+    try:
+        version = GeoObjectService.get_content_version(simulation_id)
+        
+        if current_app.config['SNAPSHOTS_ENABLED'] and response_format == 'json' and bbox is None \
+                and zoom is None and tolerance is None and precision is None and limit is None:
+            response = _send_snapshot(simulation_id, version)
+            if response is not None:
+                return response
+        
+        etag = compute_etag('geo-objects', simulation_id, version,
+                            current_app.config['GEOJSON_SQL_ASSEMBLY'], current_app.config['SPATIAL_INDEX_ENABLED'],
+                            response_format)
+        not_modified = check_not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        # Identical concurrent requests share one query; the ETag covers the content version and format
+        coalesce_key = ('geo-objects', etag, tuple(bbox) if bbox else None, zoom, tolerance, precision,
+                        after_id, limit)
+
+        if response_format == 'geobuf':
+            data = coalescer.run(coalesce_key, lambda: GeoObjectService.get_geo_objects_for_simulation_geobuf(
+                simulation_id, bbox, zoom=zoom, tolerance=tolerance,
+                precision=DEFAULT_PRECISION if precision is None else precision,
+                after_id=after_id, limit=limit
+            ))
+
+            if data is None:
+                return create_error_response("Simulation not found", 404)
+
+            response = Response(data, mimetype=GEOBUF_MIMETYPE)
+        elif stream:
+            chunks = GeoObjectService.stream_geo_objects_for_simulation(simulation_id, bbox,
+                                                                      zoom=zoom, tolerance=tolerance,
+                                                                      precision=precision)
+
+            if chunks is None:
+                return create_error_response("Simulation not found", 404)
+
+            response = Response(stream_with_context(chunks), mimetype='application/json')
+        elif current_app.config['GEOJSON_SQL_ASSEMBLY']:
+            result = coalescer.run(coalesce_key, lambda: GeoObjectService.get_geo_objects_for_simulation_json(
+                simulation_id, bbox, zoom=zoom, tolerance=tolerance, precision=precision,
+                after_id=after_id, limit=limit, version=version
+            ))
+
+            if not result:
+                return create_error_response("Simulation not found", 404)
+
+            meta = create_page_meta(result['count'], result['last_id'], limit) if limit is not None else None
+            response = create_raw_success_response(result['geojson'], meta=meta)
+        else:
+            geojson = coalescer.run(coalesce_key, lambda: GeoObjectService.get_geo_objects_for_simulation(
+                simulation_id, bbox, zoom=zoom, tolerance=tolerance, precision=precision,
+                after_id=after_id, limit=limit
+            ))
+
+            if not geojson:
+                return create_error_response("Simulation not found", 404)
+
+            meta = None
+            if limit is not None:
+                features = geojson['features']
+                last_id = features[-1]['properties']['id'] if features else None
+                meta = create_page_meta(len(features), last_id, limit)
+
+            response = create_success_response(geojson, meta=meta)
+
+        response.set_etag(etag)
+        response.vary.add('Accept')
+        return response
+    except Exception as e:
+        return create_error_response(f"Error retrieving geographic objects: {str(e)}", 500)
+
+
+@geo_object_bp.route('/simulation/<int:from_simulation_id>/diff/<int:to_simulation_id>', methods=['GET'])
+def get_geo_object_diff(from_simulation_id, to_simulation_id):
+    """Get the geographic objects added, changed or removed between two simulations"""
+    precision, error = _get_precision()
+    if error:
+        return error
+
+    try:
+        etag = compute_etag('diff', from_simulation_id, to_simulation_id,
+                            GeoObjectService.get_content_version(from_simulation_id),
+                            GeoObjectService.get_content_version(to_simulation_id))
+        not_modified = check_not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        diff = GeoObjectService.get_diff_between_simulations(from_simulation_id, to_simulation_id, precision)
+
+        if not diff:
+            return create_error_response("Simulation not found", 404)
+
+        response = create_success_response(diff)
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        return create_error_response(f"Error computing simulation diff: {str(e)}", 500)
+
+
+@geo_object_bp.route('/simulation/<int:simulation_id>/tiles/<int:z>/<int:x>/<int:y>.mvt', methods=['GET'])
+def get_geo_object_tile(simulation_id, z, x, y):
+    """Get a Mapbox Vector Tile with the geographic objects of a simulation"""
+    if z > current_app.config['TILE_MAX_ZOOM'] or x >= 2 ** z or y >= 2 ** z:
+        return create_error_response("Invalid tile coordinates", 400)
+
     try:
-        geojson = GeoObjectService.get_geo_objects_for_simulation(simulation_id, bbox)
+        version = GeoObjectService.get_content_version(simulation_id)
+        etag = compute_etag('tile', simulation_id, version)
+        not_modified = check_not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        tile = GeoObjectService.get_tile_for_simulation(simulation_id, z, x, y, version)
 
-        if not geojson:
+        if tile is None:
             return create_error_response("Simulation not found", 404)
 
+        response = Response(tile, mimetype='application/vnd.mapbox-vector-tile')
+        response.set_etag(etag)
+        return response
+    except Exception as e:
+        return create_error_response(f"Error retrieving tile: {str(e)}", 500)
+
+
+@geo_object_bp.route('/batch', methods=['GET', 'POST'])
+def get_geo_objects_batch():
+    """Get several geographic objects by ID, given as JSON {"ids": [...]} or ?ids=1,2,3"""
+    try:
+        if request.method == 'POST':
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                return create_error_response('A JSON object {"ids": [...]} is required', 400)
+            ids = payload.get('ids')
+        else:
+            ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+
+        if not isinstance(ids, list) or not ids or not all(isinstance(value, int) and not isinstance(value, bool)
+                                                              for value in ids):
+            return create_error_response("A non-empty list of integer ids is required", 400)
+    except ValueError:
+        return create_error_response("A non-empty list of integer ids is required", 400)
+
+    if len(ids) > current_app.config['GEO_OBJECT_BATCH_MAX_IDS']:
+        return create_error_response(
+            f"At most {current_app.config['GEO_OBJECT_BATCH_MAX_IDS']} ids can be requested at once", 400
+        )
+
+    precision, error = _get_precision()
+    if error:
+        return error
+
+    try:
+        geojson = GeoObjectService.get_geo_objects_by_ids(ids, precision)
         return create_success_response(geojson)
     except Exception as e:
         return create_error_response(f"Error retrieving geographic objects: {str(e)}", 500)
 
 
 @geo_object_bp.route('/<int:geo_object_id>', methods=['GET'])
+@conditional_response
 def get_geo_object(geo_object_id):
     """Get geographic object by ID"""
-    geo_object = GeoObject.get_by_id(geo_object_id)
+    precision, error = _get_precision()
+    if error:
+        return error
+
+    geo_object = GeoObject.get_by_id(geo_object_id, precision)
     if not geo_object:
         return jsonify({'error': 'Geographic object not found'}), 404
 
     feature = {
         "type": "Feature",
-        "geometry": json.loads(geo_object['geometry']),
+        "geometry": raw_json(geo_object['geometry']),
         "properties": {
             "id": geo_object['id'],
             "name": geo_object['name'],
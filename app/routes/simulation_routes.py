@@ -1,15 +1,32 @@
 from flask import Blueprint, jsonify, request
 from app.models.simulation import Simulation
+from app.services.simulation_service import SimulationService
+from app.utils import conditional_response, get_keyset_page_args, create_page_meta, create_error_response, \
+    create_success_response
 
 simulation_bp = Blueprint('simulation', __name__)
 
 @simulation_bp.route('/', methods=['GET'])
+@conditional_response
 def get_simulations():
-    """Get all simulations"""
-    simulations = Simulation.get_all()
-    return jsonify(simulations)
+    """
+    Get all simulations, paginated by keyset when limit or cursor is given.
+    The list is always wrapped in the success envelope; paged responses add the pagination meta.
+    """
+    try:
+        after_id, limit = get_keyset_page_args()
+    except ValueError as e:
+        return create_error_response(str(e), 400)
+
+    simulations = Simulation.get_all(after_id, limit)
+    meta = None
+    if limit is not None:
+        last_id = simulations[-1]['id'] if simulations else None
+        meta = create_page_meta(len(simulations), last_id, limit)
+    return create_success_response(simulations, meta=meta)
 
 @simulation_bp.route('/<int:simulation_id>', methods=['GET'])
+@conditional_response
 def get_simulation(simulation_id):
     """Get simulation by ID"""
     simulation = Simulation.get_by_id(simulation_id)
@@ -18,12 +35,23 @@ def get_simulation(simulation_id):
     return jsonify(simulation)
 
 @simulation_bp.route('/city/<int:city_id>/years', methods=['GET'])
+@conditional_response
 def get_years_by_city(city_id):
     """Get all years available for a city"""
     years = Simulation.get_years_by_city(city_id)
     return jsonify(years)
 
+@simulation_bp.route('/city/<int:city_id>/timeline', methods=['GET'])
+@conditional_response
+def get_timeline_for_city(city_id):
+    """Get the timeline of simulations available for a city"""
+    timeline = SimulationService.get_timeline_for_city(city_id)
+    if not timeline:
+        return jsonify({'error': 'City not found'}), 404
+    return jsonify(timeline)
+
 @simulation_bp.route('/city/<int:city_id>/year/<int:year>/mode/<int:mode_id>', methods=['GET'])
+@conditional_response
 def get_simulation_by_city_year(city_id, year, mode_id):
     """Get simulation by city and year"""
     simulation = Simulation.get_by_city_year(city_id, year, mode_id)
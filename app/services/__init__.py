@@ -1,9 +1,13 @@
 from app.services.city_service import CityService
 from app.services.simulation_service import SimulationService
 from app.services.geo_object_service import GeoObjectService
+from app.services.import_service import ImportService
+from app.services.snapshot_service import SnapshotService
 
 __all__ = [
     'CityService',
     'SimulationService',
-    'GeoObjectService'
+    'GeoObjectService',
+    'ImportService',
+    'SnapshotService'
 ]
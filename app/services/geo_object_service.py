@@ -1,10 +1,20 @@
 import json
+from flask import current_app
+from app import db, reference_cache, spatial_index
 from app.models import GeoObject, Simulation
-from app.utils import format_as_geojson, calculate_distance, validate_bbox
+from app.utils.geobuf import DEFAULT_PRECISION
+from app.utils import format_as_geojson, calculate_distances, validate_bbox, encode_feature, DiskCache, \
+    zoom_to_tolerance, select_lod_level, encode_geobuf, create_page_meta, SimulationIndex, raw_json, dumps_text
 
 class GeoObjectService:
+    # On-disk tile caches by (directory, size limit); one instance per process tracks the cache size
+    _tile_caches = {}
+    # Tile cache version last seen per simulation, so older versions are pruned only when it changes
+    _tile_versions = {}
+    
     @staticmethod
-    def get_geo_objects_for_simulation(simulation_id, bbox=None):
+    def get_geo_objects_for_simulation(simulation_id, bbox=None, zoom=None, tolerance=None, precision=None,
+                                       after_id=None, limit=None):
         """
         Get geographic objects for a specific simulation.
         Optionally filtered by a bounding box.
@@ -12,43 +22,46 @@ class GeoObjectService:
         Args:
             simulation_id: ID of the simulation
             bbox: Optional bounding box as [minx, miny, maxx, maxy]
+            zoom: Optional map zoom level selecting precomputed simplified geometry
+            tolerance: Optional simplification tolerance in degrees
+            precision: Optional maximum number of decimal digits in coordinates
+            after_id: Optional keyset cursor, only objects with a higher ID are returned
+            limit: Optional page size
             
         Returns:
             GeoJSON FeatureCollection or None if simulation not found
         """
+        if bbox and not validate_bbox(bbox):
+            raise ValueError("Invalid bounding box format")
+        
+        lod_level, tolerance = GeoObjectService._resolve_detail(simulation_id, zoom, tolerance)
+        
         simulation = Simulation.get_by_id(simulation_id)
         if not simulation:
             return None
         
-        if bbox and not validate_bbox(bbox):
-            raise ValueError("Invalid bounding box format")
-        
-        geo_objects = GeoObject.get_by_simulation(simulation_id, bbox)
+        geo_objects = GeoObject.get_by_simulation(simulation_id, bbox, lod_level, tolerance, precision,
+                                                 after_id, limit)
         
+        # Geometry is embedded as returned by PostGIS unless distances have to be computed from it
+        parse_geometry = 'center_point' in simulation
         features = []
         for obj in geo_objects:
-            geometry = json.loads(obj['geometry'])
-            
-            additional_props = {}
-            if 'center_point' in simulation and geometry['type'] == 'Point':
-                center = simulation['center_point']
-                obj_coords = geometry['coordinates']
-                distance = calculate_distance((center[0], center[1]), (obj_coords[0], obj_coords[1]))
-                additional_props['distance_from_center'] = round(distance, 2)
-            
             feature = {
                 "type": "Feature",
-                "geometry": geometry,
+                "geometry": json.loads(obj['geometry']) if parse_geometry else raw_json(obj['geometry']),
                 "properties": {
                     "id": obj['id'],
                     "name": obj['name'],
                     "role": obj['role'],
-                    "description": obj['description'],
-                    **additional_props
+                    "description": obj['description']
                 }
             }
             features.append(feature)
         
+        if 'center_point' in simulation:
+            GeoObjectService._add_distances_from_center(features, simulation['center_point'])
+        
         geojson = format_as_geojson(features)
         
         geojson["metadata"] = {
@@ -61,3 +74,444 @@ class GeoObjectService:
         }
         
         return geojson
+    
+    @staticmethod
+    def _resolve_detail(simulation_id, zoom=None, tolerance=None):
+        """
+        Map a zoom level to a precomputed LOD level; an explicit tolerance is passed through.
+        Until LOD geometry has been built for the simulation, the zoom is served by
+        simplifying on the fly with the tolerance of the selected level.
+        """
+        if tolerance:
+            return None, tolerance
+        if zoom is None:
+            return None, None
+        
+        lod_level = select_lod_level(zoom, current_app.config['GEO_LOD_ZOOM_LEVELS'])
+        if lod_level is not None and not GeoObject.has_lod(simulation_id, lod_level):
+            return None, zoom_to_tolerance(lod_level, current_app.config['GEO_LOD_PIXEL_TOLERANCE'])
+        return lod_level, None
+    
+    @staticmethod
+    def build_lod(simulation_id=None):
+        """
+        Precompute simplified geometry for every configured LOD zoom level.
+        
+        Args:
+            simulation_id: Optional simulation to restrict the build to
+            
+        Returns:
+            List of (zoom, tolerance) pairs that were built
+        """
+        GeoObject.ensure_lod_schema()
+        
+        built = []
+        with db.transaction():
+            for zoom in sorted(current_app.config['GEO_LOD_ZOOM_LEVELS']):
+                tolerance = zoom_to_tolerance(zoom, current_app.config['GEO_LOD_PIXEL_TOLERANCE'])
+                GeoObject.build_lod(zoom, tolerance, simulation_id)
+                built.append((zoom, tolerance))
+            # Responses at a zoom level change with the LOD geometry
+            GeoObject.bump_simulation_version(simulation_id)
+        
+        reference_cache.invalidate('geo_object_lod')
+        return built
+    
+    @staticmethod
+    def _add_distances_from_center(features, center):
+        """Set distance_from_center on every Point feature, computed in one vectorized pass"""
+        points = [feature for feature in features if feature['geometry']['type'] == 'Point']
+        if not points:
+            return
+        
+        coords = [feature['geometry']['coordinates'][:2] for feature in points]
+        distances = calculate_distances((center[0], center[1]), coords).round(2)
+        
+        for feature, distance in zip(points, distances.tolist()):
+            feature['properties']['distance_from_center'] = distance
+    
+    @staticmethod
+    def get_geo_objects_for_simulation_json(simulation_id, bbox=None, zoom=None, tolerance=None, precision=None,
+                                            after_id=None, limit=None, version=None):
+        """
+        Get geographic objects for a specific simulation as pre-encoded JSON.
+        The FeatureCollection and its metadata are built by PostgreSQL, so no
+        per-feature Python objects are created.
+        
+        Args:
+            simulation_id: ID of the simulation
+            bbox: Optional bounding box as [minx, miny, maxx, maxy]
+            zoom: Optional map zoom level selecting precomputed simplified geometry
+            tolerance: Optional simplification tolerance in degrees
+            precision: Optional maximum number of decimal digits in coordinates
+            after_id: Optional keyset cursor, only objects with a higher ID are returned
+            limit: Optional page size
+            version: Content version of the simulation if the caller has already read it
+            
+        Returns:
+            Row with the FeatureCollection as JSON text (geojson), the number of
+            features (count) and the last object ID (last_id), or None if simulation not found
+        """
+        if bbox and not validate_bbox(bbox):
+            raise ValueError("Invalid bounding box format")
+        
+        lod_level, tolerance = GeoObjectService._resolve_detail(simulation_id, zoom, tolerance)
+        
+        # Full-detail bbox queries of indexed simulations are answered from memory; the index is
+        # keyed by the revision lookup the route has already made
+        if bbox and current_app.config['SPATIAL_INDEX_ENABLED'] and lod_level is None and not tolerance \
+                and precision is None:
+            simulation = Simulation.get_by_id(simulation_id)
+            if not simulation:
+                return None
+            
+            if version is None:
+                version = GeoObjectService.get_content_version(simulation_id)
+            index = spatial_index.get(simulation_id, version,
+                                      lambda node_capacity: GeoObjectService._build_spatial_index(simulation_id,
+                                                                                                   node_capacity))
+            if index is not None:
+                ids, fragments = index.query(bbox, after_id, limit)
+                metadata = {
+                    "simulation_id": simulation_id,
+                    "year": simulation['year'],
+                    "city": simulation['city_name'],
+                    "mode": simulation['mode_name'],
+                    "count": len(ids),
+                    "bbox": bbox
+                }
+                geojson = ('{"type": "FeatureCollection", "features": [' + ', '.join(fragments) +
+                           '], "metadata": ' + dumps_text(metadata) + '}')
+                return {'geojson': geojson, 'count': len(ids), 'last_id': ids[-1] if ids else None}
+        
+        return GeoObject.get_feature_collection_json(simulation_id, bbox, lod_level, tolerance, precision,
+                                                     after_id, limit)
+    
+    @staticmethod
+    def _build_spatial_index(simulation_id, node_capacity):
+        """
+        Load the objects of a simulation into an in-memory R-tree with
+        pre-serialized feature fragments.
+        
+        Args:
+            simulation_id: ID of the simulation
+            node_capacity: R-tree node capacity
+            
+        Returns:
+            SimulationIndex
+        """
+        ids = []
+        boxes = []
+        fragments = []
+        for rows in GeoObject.iter_index_rows(simulation_id):
+            for obj in rows:
+                ids.append(obj['id'])
+                boxes.append((obj['minx'], obj['miny'], obj['maxx'], obj['maxy']))
+                fragments.append(encode_feature(obj['geometry'], {
+                    "id": obj['id'],
+                    "name": obj['name'],
+                    "role": obj['role'],
+                    "description": obj['description']
+                }))
+        
+        return SimulationIndex(ids, boxes, fragments, node_capacity)
+    
+    @staticmethod
+    def get_geo_objects_for_simulation_geobuf(simulation_id, bbox=None, zoom=None, tolerance=None,
+                                              precision=DEFAULT_PRECISION, after_id=None, limit=None):
+        """
+        Get geographic objects for a specific simulation encoded as Geobuf.
+        Coordinates are quantized to the given precision and delta-encoded.
+        The metadata block is stored as a custom property of the collection.
+        
+        Args:
+            simulation_id: ID of the simulation
+            bbox: Optional bounding box as [minx, miny, maxx, maxy]
+            zoom: Optional map zoom level selecting precomputed simplified geometry
+            tolerance: Optional simplification tolerance in degrees
+            precision: Number of decimal digits kept in coordinates
+            after_id: Optional keyset cursor, only objects with a higher ID are returned
+            limit: Optional page size
+            
+        Returns:
+            Geobuf document as bytes or None if simulation not found
+        """
+        if bbox and not validate_bbox(bbox):
+            raise ValueError("Invalid bounding box format")
+        
+        lod_level, tolerance = GeoObjectService._resolve_detail(simulation_id, zoom, tolerance)
+        
+        simulation = Simulation.get_by_id(simulation_id)
+        if not simulation:
+            return None
+        
+        geo_objects = GeoObject.get_by_simulation(simulation_id, bbox, lod_level, tolerance, precision,
+                                                 after_id, limit)
+        
+        features = (
+            {
+                "type": "Feature",
+                "id": obj['id'],
+                "geometry": json.loads(obj['geometry']),
+                "properties": {
+                    "name": obj['name'],
+                    "role": obj['role'],
+                    "description": obj['description']
+                }
+            }
+            for obj in geo_objects
+        )
+        
+        metadata = {
+            "simulation_id": simulation_id,
+            "year": simulation['year'],
+            "city": simulation['city_name'],
+            "mode": simulation['mode_name'],
+            "count": len(geo_objects),
+            "bbox": bbox
+        }
+        
+        if limit is not None:
+            last_id = geo_objects[-1]['id'] if geo_objects else None
+            metadata["pagination"] = create_page_meta(len(geo_objects), last_id, limit)
+        
+        return encode_geobuf(features, precision, {"metadata": metadata})
+    
+    @staticmethod
+    def stream_geo_objects_for_simulation(simulation_id, bbox=None, batch_size=None, zoom=None, tolerance=None,
+                                          precision=None):
+        """
+        Stream geographic objects for a specific simulation as JSON text chunks.
+        Rows are read from a server-side cursor in batches, so memory use does
+        not grow with the size of the simulation.
+        
+        Args:
+            simulation_id: ID of the simulation
+            bbox: Optional bounding box as [minx, miny, maxx, maxy]
+            batch_size: Number of rows fetched per round trip
+            zoom: Optional map zoom level selecting precomputed simplified geometry
+            tolerance: Optional simplification tolerance in degrees
+            precision: Optional maximum number of decimal digits in coordinates
+            
+        Returns:
+            Generator of response body chunks or None if simulation not found
+        """
+        simulation = Simulation.get_by_id(simulation_id)
+        if not simulation:
+            return None
+        
+        if bbox and not validate_bbox(bbox):
+            raise ValueError("Invalid bounding box format")
+        
+        lod_level, tolerance = GeoObjectService._resolve_detail(simulation_id, zoom, tolerance)
+        
+        def generate():
+            yield '{"success": true, "message": "Success", "data": {"type": "FeatureCollection", "features": ['
+            
+            count = 0
+            for rows in GeoObject.iter_by_simulation(simulation_id, bbox, batch_size, lod_level, tolerance,
+                                                     precision):
+                chunk = ', '.join(
+                    encode_feature(obj['geometry'], {
+                        "id": obj['id'],
+                        "name": obj['name'],
+                        "role": obj['role'],
+                        "description": obj['description']
+                    })
+                    for obj in rows
+                )
+                yield (', ' if count else '') + chunk
+                count += len(rows)
+            
+            metadata = {
+                "simulation_id": simulation_id,
+                "year": simulation['year'],
+                "city": simulation['city_name'],
+                "mode": simulation['mode_name'],
+                "count": count,
+                "bbox": bbox
+            }
+            yield '], "metadata": ' + dumps_text(metadata) + '}}'
+        
+        return generate()
+    
+    @staticmethod
+    def get_diff_between_simulations(from_simulation_id, to_simulation_id, precision=None):
+        """
+        Get only the geographic objects that differ between two simulations,
+        e.g. two consecutive years of a city timeline.
+        
+        Args:
+            from_simulation_id: ID of the simulation the client already has
+            to_simulation_id: ID of the simulation to move to
+            precision: Optional maximum number of decimal digits in coordinates
+            
+        Returns:
+            Dictionary with added and changed FeatureCollections and removed IDs,
+            or None if either simulation is not found
+        """
+        if not Simulation.get_by_id(from_simulation_id) or not Simulation.get_by_id(to_simulation_id):
+            return None
+        
+        diff = GeoObject.get_diff(from_simulation_id, to_simulation_id, precision)
+        
+        added = []
+        changed = []
+        removed = []
+        for obj in diff:
+            if obj['change'] == 'removed':
+                removed.append(obj['id'])
+                continue
+            
+            properties = {
+                "id": obj['id'],
+                "name": obj['name'],
+                "role": obj['role'],
+                "description": obj['description']
+            }
+            if obj['change'] == 'changed':
+                properties["previous_id"] = obj['previous_id']
+            
+            feature = {
+                "type": "Feature",
+                "geometry": raw_json(obj['geometry']),
+                "properties": properties
+            }
+            (changed if obj['change'] == 'changed' else added).append(feature)
+        
+        return {
+            "from_simulation_id": from_simulation_id,
+            "to_simulation_id": to_simulation_id,
+            "added": format_as_geojson(added),
+            "changed": format_as_geojson(changed),
+            "removed": removed,
+            "counts": {
+                "added": len(added),
+                "changed": len(changed),
+                "removed": len(removed)
+            }
+        }
+    
+    @staticmethod
+    def get_geo_objects_by_ids(geo_object_ids, precision=None):
+        """
+        Get several geographic objects with one query.
+        
+        Args:
+            geo_object_ids: List of object IDs; order and duplicates are preserved
+            precision: Optional maximum number of decimal digits in coordinates
+            
+        Returns:
+            GeoJSON FeatureCollection in input order; missing objects are
+            features with a null geometry and an error property
+        """
+        found = {obj['id']: obj for obj in GeoObject.get_by_ids(set(geo_object_ids), precision)}
+        
+        features = []
+        not_found = []
+        for geo_object_id in geo_object_ids:
+            obj = found.get(geo_object_id)
+            if obj is None:
+                not_found.append(geo_object_id)
+                features.append({
+                    "type": "Feature",
+                    "geometry": None,
+                    "properties": {
+                        "id": geo_object_id,
+                        "error": "Geographic object not found"
+                    }
+                })
+                continue
+            
+            features.append({
+                "type": "Feature",
+                "geometry": raw_json(obj['geometry']),
+                "properties": {
+                    "id": obj['id'],
+                    "name": obj['name'],
+                    "role": obj['role'],
+                    "description": obj['description']
+                }
+            })
+        
+        geojson = format_as_geojson(features)
+        geojson["metadata"] = {
+            "requested": len(geo_object_ids),
+            "found": len(geo_object_ids) - len(not_found),
+            "not_found": not_found
+        }
+        
+        return geojson
+    
+    @staticmethod
+    def get_content_version(simulation_id):
+        """
+        Get the content version of a simulation's geographic objects.
+        Used to build ETags without running the spatial query.
+        
+        Args:
+            simulation_id: ID of the simulation
+            
+        Returns:
+            Version string that changes whenever the linked objects change
+        """
+        return GeoObject.get_simulation_version(simulation_id)
+    
+    @staticmethod
+    def get_tile_for_simulation(simulation_id, z, x, y, version=None):
+        """
+        Get a Mapbox Vector Tile for a simulation, served from the on-disk
+        tile cache when it has already been rendered for the current content version.
+        
+        Args:
+            simulation_id: ID of the simulation
+            z: Zoom level
+            x: Tile column
+            y: Tile row
+            version: Content version of the simulation, read from the database when not given
+            
+        Returns:
+            Tile as bytes (empty for a tile without objects) or None if simulation not found
+        """
+        if version is None:
+            version = GeoObjectService.get_content_version(simulation_id)
+        
+        # The version is a revision token, short and safe to use as a path segment
+        cache = GeoObjectService.get_tile_cache()
+        key = (simulation_id, version, z, x, y)
+        
+        tile = cache.get(key)
+        if tile is not None:
+            return tile
+        
+        if not Simulation.get_by_id(simulation_id):
+            return None
+        
+        tile = GeoObject.get_tile(
+            simulation_id, z, x, y,
+            extent=current_app.config['TILE_EXTENT'],
+            buffer=current_app.config['TILE_BUFFER']
+        )
+        # Tiles of older versions can never be served again
+        if GeoObjectService._tile_versions.get(simulation_id) != version:
+            cache.retain((simulation_id,), version)
+            GeoObjectService._tile_versions[simulation_id] = version
+        cache.set(key, tile)
+        return tile
+    
+    @staticmethod
+    def invalidate_tiles(simulation_id=None):
+        """Drop cached tiles of one simulation, or of all simulations"""
+        prefix = (simulation_id,) if simulation_id is not None else ()
+        GeoObjectService.get_tile_cache().invalidate(prefix)
+    
+    @staticmethod
+    def get_tile_cache():
+        """Get the on-disk vector tile cache, shared by the requests of the process"""
+        root = current_app.config['TILE_CACHE_DIR']
+        max_bytes = current_app.config['TILE_CACHE_MAX_BYTES']
+        cache = GeoObjectService._tile_caches.get((root, max_bytes))
+        if cache is None:
+            cache = GeoObjectService._tile_caches[(root, max_bytes)] = DiskCache(root, suffix='.mvt',
+                                                                                 max_bytes=max_bytes)
+        return cache
@@ -0,0 +1,128 @@
+"""
+Import service module.
+Contains the bulk import of geographic objects into a simulation.
+"""
+import json
+import time
+from flask import current_app
+from app import db, compression, spatial_index
+from app.models import GeoObject, Simulation
+from app.services.geo_object_service import GeoObjectService
+from app.services.snapshot_service import SnapshotService
+from app.utils.validation_utils import iter_validated_features
+
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportService:
+    @staticmethod
+    def import_geojson(stream, simulation_id, batch_size=None, strict=False, progress=None):
+        """
+        Import the features of a GeoJSON document into a simulation.
+        Features are read one at a time, checked and copied into a staging
+        table in batches with COPY; objects identical to ones of earlier
+        simulations of the same city are reused instead of duplicated.
+        Level-of-detail geometry of the simulation is rebuilt after the merge.
+        Everything runs in one transaction.
+
+        Args:
+            stream: Binary file-like object with a FeatureCollection or GeoJSON sequence
+            simulation_id: ID of the simulation to link the objects to
+            batch_size: Number of features copied per COPY statement
+            strict: Abort on the first invalid feature instead of skipping it and reporting its errors
+            progress: Optional callable receiving the number of features staged so far
+
+        Returns:
+            Import report, or None if simulation not found
+
+        Raises:
+            ValueError: If strict and a feature is invalid
+        """
+        simulation = Simulation.get_by_id(simulation_id)
+        if not simulation:
+            return None
+
+        batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+        started = time.perf_counter()
+        invalid = 0
+        errors = []
+
+        with db.transaction():
+            GeoObject.create_import_staging()
+
+            batch = []
+            staged = 0
+            for index, feature, feature_errors in iter_validated_features(stream):
+                if feature_errors:
+                    if strict:
+                        first = feature_errors[0]
+                        raise ValueError(f"Feature {index} at '{first['path']}': {first['error']}")
+                    invalid += 1
+                    errors.extend(feature_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                    continue
+
+                properties = feature['properties'] or {}
+                batch.append((
+                    index,
+                    ImportService._text(properties.get('name')),
+                    ImportService._text(properties.get('role')),
+                    ImportService._text(properties.get('description')),
+                    json.dumps(feature['geometry'])
+                ))
+
+                if len(batch) >= batch_size:
+                    staged += GeoObject.stage_import_rows(batch)
+                    batch = []
+                    if progress:
+                        progress(staged)
+
+            if batch:
+                staged += GeoObject.stage_import_rows(batch)
+                if progress:
+                    progress(staged)
+
+            counts = GeoObject.merge_import(simulation_id, simulation['city_id'])
+            GeoObject.bump_simulation_version(simulation_id)
+            GeoObjectService.build_lod(simulation_id)
+
+        ImportService._invalidate_caches(simulation_id)
+
+        elapsed = time.perf_counter() - started
+        rows_written = counts['staged'] + counts['inserted'] + counts['linked']
+        return {
+            'simulation_id': simulation_id,
+            'features': counts['staged'] + invalid,
+            'invalid': invalid,
+            'errors': errors,
+            'staged': counts['staged'],
+            'reused': counts['reused'],
+            'inserted': counts['inserted'],
+            'linked': counts['linked'],
+            'seconds': round(elapsed, 3),
+            'features_per_second': round(counts['staged'] / elapsed, 1) if elapsed else 0.0,
+            'rows_per_second': round(rows_written / elapsed, 1) if elapsed else 0.0
+        }
+
+    @staticmethod
+    def _text(value):
+        """Store scalar properties as text and anything else as JSON"""
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return str(value)
+
+    @staticmethod
+    def _invalidate_caches(simulation_id):
+        """
+        Drop everything derived from the objects of a simulation in this process.
+        Other processes, e.g. the web workers when the import runs from the CLI,
+        need no signal: ETags, compressed bodies, tiles, snapshots, R-trees and
+        coalesced results are keyed by the content version, which is read from
+        the database on every request and changes with the import. Their entries
+        of the old version are just no longer used.
+        """
+        GeoObjectService.invalidate_tiles(simulation_id)
+        SnapshotService.invalidate(simulation_id)
+        spatial_index.invalidate(simulation_id)
+        compression.clear()
@@ -21,20 +21,13 @@ class SimulationService:
         if not city:
             return None
         
-        years = Simulation.get_years_by_city(city_id)
-        modes = Simulation.get_modes()
-        
-        timeline = []
-        for year in years:
-            for mode in modes:
-                simulation = Simulation.get_by_city_year(city_id, year, mode)
-                if simulation:
-                    timeline_entry = {
-                        'year': year,
-                        'simulation_id': simulation['id'],
-                    }
-                    timeline.append(timeline_entry)
-                    break
+        timeline = [
+            {
+                'year': entry['year'],
+                'simulation_id': entry['simulation_id'],
+            }
+            for entry in Simulation.get_timeline_by_city(city_id)
+        ]
         
         return {
             'city': city,
@@ -0,0 +1,163 @@
+"""
+Snapshot service module.
+Contains the building and lookup of precomputed, pre-compressed response
+bodies with all geographic objects of a simulation.
+"""
+import logging
+import os
+import threading
+import time
+from flask import current_app
+from app import db, coalescer
+from app.models import GeoObject, Simulation
+from app.services.geo_object_service import GeoObjectService
+from app.utils.snapshot_store import SnapshotStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotService:
+    @staticmethod
+    def build(simulation_id):
+        """
+        Write the snapshot of a simulation's current objects.
+        The body is streamed from the database to disk, so it is never held in memory.
+
+        Args:
+            simulation_id: ID of the simulation
+
+        Returns:
+            (content version, body size) tuple, or None if simulation not found
+        """
+        # The revision table may have to be created, which a read-only transaction cannot do
+        GeoObject.ensure_revision_schema()
+
+        # The version is read uncached, so it comes from the same database snapshot as the objects
+        with db.read_only_transaction():
+            version = GeoObject.get_simulation_version(simulation_id)
+            chunks = GeoObjectService.stream_geo_objects_for_simulation(simulation_id)
+            if chunks is None:
+                return None
+
+            size = SnapshotService.get_store().write(simulation_id, version, chunks, {
+                'gzip': current_app.config['SNAPSHOT_GZIP_LEVEL'],
+                'br': current_app.config['SNAPSHOT_BROTLI_QUALITY']
+            })
+        return version, size
+
+    @staticmethod
+    def get_snapshot(simulation_id, version, encodings=()):
+        """
+        Get the snapshot file of a simulation at a content version, building it
+        first when SNAPSHOT_BUILD_ON_DEMAND is set. Concurrent builds of the same
+        snapshot are coalesced.
+
+        Args:
+            simulation_id: ID of the simulation
+            version: Current content version of the simulation, i.e. the revision the route
+                has already read for its ETag; serving an existing snapshot needs no other query
+            encodings: Content encodings accepted by the client, preferred first
+
+        Returns:
+            (path, content encoding or None) tuple, or None if there is no snapshot
+        """
+        store = SnapshotService.get_store()
+        if store.find(simulation_id, version) is None:
+            if not current_app.config['SNAPSHOT_BUILD_ON_DEMAND']:
+                return None
+            coalescer.run(('snapshot', simulation_id, version), lambda: SnapshotService.build(simulation_id))
+            if store.find(simulation_id, version) is None:
+                return None
+
+        for encoding in encodings:
+            path = store.find(simulation_id, version, encoding)
+            if path:
+                return path, encoding
+        return store.find(simulation_id, version), None
+
+    @staticmethod
+    def warm_up(simulation_ids=None):
+        """
+        Build the snapshots that are missing or outdated.
+
+        Args:
+            simulation_ids: Only warm up these simulations; None warms up all of them
+
+        Returns:
+            List of (simulation ID, body size or None if it was up to date) tuples
+        """
+        if simulation_ids is None:
+            simulation_ids = [simulation['id'] for simulation in Simulation.get_all()]
+
+        store = SnapshotService.get_store()
+        built = []
+        for simulation_id in simulation_ids:
+            version = GeoObjectService.get_content_version(simulation_id)
+            if store.find(simulation_id, version):
+                built.append((simulation_id, None))
+                continue
+
+            started = time.perf_counter()
+            result = coalescer.run(('snapshot', simulation_id, version), lambda: SnapshotService.build(simulation_id))
+            if result is not None:
+                logger.info(f"Built snapshot of simulation {simulation_id} ({result[1]} bytes) "
+                            f"in {time.perf_counter() - started:.1f} s")
+                built.append((simulation_id, result[1]))
+        return built
+
+    @staticmethod
+    def start_warm_up(app):
+        """
+        Warm up the snapshots of all simulations in a background thread when
+        SNAPSHOTS_ENABLED and SNAPSHOT_WARMUP are set. Called by the servers,
+        not by create_app, so CLI commands do not start it. A lock file in
+        SNAPSHOT_DIR lets only one of the workers starting together run it.
+
+        Args:
+            app: Flask app to warm up the snapshots of
+
+        Returns:
+            The started thread, or None if warm-up is disabled or runs in another process
+        """
+        if not (app.config['SNAPSHOTS_ENABLED'] and app.config['SNAPSHOT_WARMUP']):
+            return None
+
+        lock_file = None
+        if fcntl is not None:
+            os.makedirs(app.config['SNAPSHOT_DIR'], exist_ok=True)
+            lock_file = open(os.path.join(app.config['SNAPSHOT_DIR'], '.warm-up.lock'), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                logger.info("Snapshot warm-up is running in another process")
+                return None
+
+        def run():
+            with app.app_context():
+                try:
+                    SnapshotService.warm_up()
+                except Exception as e:
+                    logger.error(f"Snapshot warm-up failed: {str(e)}")
+                finally:
+                    if lock_file is not None:
+                        lock_file.close()
+
+        thread = threading.Thread(target=run, name='snapshot-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def invalidate(simulation_id=None):
+        """Drop the snapshots of one simulation, or of all simulations"""
+        SnapshotService.get_store().invalidate(simulation_id)
+
+    @staticmethod
+    def get_store():
+        """Get the on-disk snapshot store"""
+        return SnapshotStore(current_app.config['SNAPSHOT_DIR'])
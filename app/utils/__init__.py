@@ -3,16 +3,60 @@ Utilities module.
 Provides various helper functions for the application.
 """
 
-from app.utils.geo_utils import calculate_distance, format_as_geojson
-from app.utils.validation_utils import validate_bbox, validate_geojson
-from app.utils.response_utils import create_error_response, create_success_response, paginate_results
+from app.utils.json_provider import FastJSONProvider, RawJSON, raw_json, dumps_text
+from app.utils.geo_utils import calculate_distance, calculate_distances, format_as_geojson, encode_feature, \
+    zoom_to_tolerance, select_lod_level
+from app.utils.validation_utils import validate_bbox, validate_geojson, validate_geojson_stream, \
+    iter_validated_features
+from app.utils.geojson_stream import iter_geojson_features, GeoJSONStreamError
+from app.utils.geobuf import encode_geobuf
+from app.utils.disk_cache import DiskCache
+from app.utils.snapshot_store import SnapshotStore
+from app.utils.cache_utils import TTLCache
+from app.utils.compression_utils import ResponseCompressor
+from app.utils.metrics_utils import Metrics
+from app.utils.spatial_index import STRTree, SimulationIndex, SpatialIndexCache
+from app.utils.coalesce_utils import RequestCoalescer
+from app.utils.etag_utils import compute_etag, check_not_modified, conditional_response
+from app.utils.response_utils import create_error_response, create_success_response, create_raw_success_response, \
+    paginate_results, encode_cursor, decode_cursor, get_keyset_page_args, create_page_meta
 
 __all__ = [
+    'FastJSONProvider',
+    'RawJSON',
+    'raw_json',
+    'dumps_text',
     'calculate_distance',
+    'calculate_distances',
     'format_as_geojson',
+    'encode_feature',
+    'zoom_to_tolerance',
+    'select_lod_level',
     'validate_bbox',
     'validate_geojson',
+    'validate_geojson_stream',
+    'iter_validated_features',
+    'iter_geojson_features',
+    'GeoJSONStreamError',
+    'encode_geobuf',
+    'DiskCache',
+    'SnapshotStore',
+    'TTLCache',
+    'ResponseCompressor',
+    'Metrics',
+    'STRTree',
+    'SimulationIndex',
+    'SpatialIndexCache',
+    'RequestCoalescer',
+    'compute_etag',
+    'check_not_modified',
+    'conditional_response',
     'create_error_response',
     'create_success_response',
-    'paginate_results'
+    'create_raw_success_response',
+    'paginate_results',
+    'encode_cursor',
+    'decode_cursor',
+    'get_keyset_page_args',
+    'create_page_meta'
 ]
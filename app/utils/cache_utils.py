@@ -0,0 +1,146 @@
+"""
+Cache utilities.
+Contains an in-process cache with TTL expiry and LRU eviction for
+reference data that rarely changes.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class TTLCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        """
+        Create a cache.
+        
+        Args:
+            max_size: Maximum number of entries before least recently used ones are evicted
+            ttl: Seconds an entry stays valid; 0 disables caching
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+    
+    def init_app(self, app, name: str = 'cache'):
+        """Configure the cache from a Flask app and expose its statistics"""
+        self.max_size = app.config['REFERENCE_CACHE_MAX_SIZE']
+        self.ttl = app.config['REFERENCE_CACHE_TTL']
+        self.clear()
+        
+        @app.route(f'/api/healthcheck/{name}', methods=['GET'], endpoint=f'{name}_healthcheck')
+        def cache_healthcheck():
+            return {'status': 'Cache enabled' if self.ttl else 'Cache disabled', 'stats': self.stats()}, 200
+    
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """
+        Look up an entry.
+        
+        Args:
+            key: Cache key; the first element is the namespace
+            
+        Returns:
+            (hit, value) tuple
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return False, None
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return False, None
+            
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return True, value
+    
+    def set(self, key: Tuple, value: Any) -> None:
+        """
+        Store an entry, evicting the least recently used ones past max_size.
+        
+        Args:
+            key: Cache key; the first element is the namespace
+            value: Value to cache
+        """
+        if not self.ttl or self.max_size <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+    
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """
+        Drop cached entries.
+        
+        Args:
+            namespace: Only drop entries of this namespace; None drops everything
+        """
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == namespace]:
+                    del self._entries[key]
+            self._counters['invalidations'] += 1
+    
+    def clear(self) -> None:
+        """Drop every entry without counting an invalidation"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """
+        Get cache usage counters.
+        
+        Returns:
+            Dictionary with size, limits and hit/miss counters
+        """
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hit_ratio': round(self._counters['hits'] / lookups, 4) if lookups else 0.0,
+                **self._counters
+            }
+    
+    def cached(self, namespace: str) -> Callable:
+        """
+        Decorate a function so its non-None results are cached per argument list.
+        Cached values are shared between callers and must not be mutated.
+        
+        Args:
+            namespace: Namespace used for invalidation
+            
+        Returns:
+            Decorator
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (namespace, func.__qualname__, args, tuple(sorted(kwargs.items())))
+                hit, value = self.get(key)
+                if hit:
+                    return value
+                
+                value = func(*args, **kwargs)
+                if value is not None:
+                    self.set(key, value)
+                return value
+            
+            wrapper.uncached = func
+            return wrapper
+        return decorator
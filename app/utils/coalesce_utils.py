@@ -0,0 +1,228 @@
+"""
+Request coalescing utilities.
+Contains a single-flight helper: concurrent calls with the same key share one
+computation. Calls are coalesced between the threads of a worker and, when a
+shared directory is configured, between workers through file locks.
+Results are handed between workers as pickles, so the directory has to be
+private to the user running the workers; shared coalescing is switched off
+when it is not.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Delay between attempts to take a lock held by another worker
+LOCK_POLL_INTERVAL = 0.01
+# Minimum seconds between two sweeps of expired results from the shared directory
+SWEEP_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    def __init__(self, timeout: float = 30, shared_dir: Optional[str] = None, result_ttl: float = 5,
+                 lock_stripes: int = 4096):
+        """
+        Create a coalescer.
+
+        Args:
+            timeout: Seconds a caller waits for another one's result before computing it itself
+            shared_dir: Directory for cross-worker locks and results; None coalesces within the process only
+            result_ttl: Seconds a result written by another worker can be reused
+            lock_stripes: Number of lock files keys are hashed onto across workers. Keys sharing
+                a lock file are computed one after another, so it should be well above the number
+                of distinct keys in flight; the lock files are never removed.
+        """
+        self.enabled = True
+        self.timeout = timeout
+        self.shared_dir = shared_dir
+        self.result_ttl = result_ttl
+        self.lock_stripes = lock_stripes
+        self._next_sweep = 0.0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'leaders': 0, 'followers': 0, 'shared_results': 0, 'timeouts': 0}
+
+    def init_app(self, app, name: str = 'coalescing'):
+        """Configure coalescing from a Flask app and expose its statistics"""
+        self.enabled = app.config['COALESCING_ENABLED']
+        self.timeout = app.config['COALESCING_TIMEOUT']
+        self.result_ttl = app.config['COALESCING_RESULT_TTL']
+        self.lock_stripes = app.config['COALESCING_LOCK_STRIPES']
+        self.shared_dir = None
+        if app.config['COALESCING_SHARED'] and fcntl and self._prepare_shared_dir(app.config['COALESCING_DIR']):
+            self.shared_dir = app.config['COALESCING_DIR']
+
+        @app.route(f'/api/healthcheck/{name}', methods=['GET'], endpoint=f'{name}_healthcheck')
+        def coalescing_healthcheck():
+            if not self.enabled:
+                status = 'Coalescing disabled'
+            else:
+                status = 'Coalescing across workers' if self.shared_dir else 'Coalescing within the worker'
+            return {'status': status, 'in_flight': len(self._calls), 'stats': self.stats()}, 200
+
+    def run(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the result of compute, sharing it with concurrent calls for the same key.
+        The key has to identify the result completely, including the content version.
+        Exceptions raised by compute are raised in every caller that shares it.
+
+        Args:
+            key: Hashable key of the computation
+            compute: Callable producing the result
+
+        Returns:
+            Result of compute, possibly computed by another thread or worker
+        """
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters['leaders'] += 1
+            else:
+                self._counters['followers'] += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                with self._lock:
+                    self._counters['timeouts'] += 1
+                return compute()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_shared(key, compute) if self.shared_dir else compute()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    @staticmethod
+    def _prepare_shared_dir(path: str) -> bool:
+        """
+        Create the shared directory with mode 0o700, or restrict an existing one the current user owns.
+        Anyone able to place a file there could run code in the workers through the pickled results.
+        """
+        try:
+            os.makedirs(path, mode=0o700, exist_ok=True)
+            stat = os.stat(path)
+            if stat.st_uid == os.getuid() and stat.st_mode & 0o077:
+                os.chmod(path, 0o700)
+                stat = os.stat(path)
+        except OSError as e:
+            logger.warning(f"Coalescing directory {path} is not usable, coalescing within the worker: {str(e)}")
+            return False
+
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            logger.warning(f"Coalescing directory {path} is accessible to other users, coalescing within the worker")
+            return False
+        return True
+
+    def _run_shared(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Coalesce with other workers: one holds the key's file lock while computing, the others reuse its result"""
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        lock_path = os.path.join(self.shared_dir, f'{int(digest, 16) % self.lock_stripes}.lock')
+        result_path = os.path.join(self.shared_dir, f'{digest}.result')
+
+        with open(lock_path, 'a') as lock_file:
+            if not self._acquire(lock_file):
+                with self._lock:
+                    self._counters['timeouts'] += 1
+                return compute()
+
+            try:
+                result = self._read_result(result_path)
+                if result is not None:
+                    with self._lock:
+                        self._counters['shared_results'] += 1
+                    return result[0]
+
+                value = compute()
+                self._write_result(result_path, value)
+                return value
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, lock_file) -> bool:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def _read_result(self, path: str) -> Optional[tuple]:
+        """Load a result another worker wrote less than result_ttl seconds ago, as a 1-tuple"""
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path, 'rb') as f:
+                return (pickle.load(f),)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write_result(self, path: str, value: Any) -> None:
+        """Publish a result for workers waiting on the lock"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.shared_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+            self._sweep()
+
+    def _sweep(self) -> None:
+        """Remove results older than result_ttl; they are never read again"""
+        expired = time.time() - self.result_ttl
+        for entry in os.scandir(self.shared_dir):
+            if entry.name.endswith('.result'):
+                try:
+                    if entry.stat().st_mtime < expired:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict:
+        """
+        Get coalescing counters.
+
+        Returns:
+            Dictionary with the number of leading, following and timed out calls
+        """
+        with self._lock:
+            return dict(self._counters)
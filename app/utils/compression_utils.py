@@ -0,0 +1,170 @@
+"""
+Compression utilities.
+Contains gzip/brotli response compression with content negotiation and a
+byte-bounded cache of compressed bodies for responses identified by an ETag.
+"""
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def etag_variant(etag: str, encoding: str) -> str:
+    """
+    Derive the strong ETag of an encoded representation.
+
+    Args:
+        etag: ETag of the identity representation
+        encoding: Content-Encoding of the variant
+
+    Returns:
+        ETag of the encoded variant
+    """
+    return f"{etag}-{encoding}"
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress a response body.
+
+    Args:
+        data: Uncompressed body
+        encoding: 'br' or 'gzip'
+        level: Brotli quality or gzip compression level
+
+    Returns:
+        Compressed body
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class ResponseCompressor:
+    def __init__(self):
+        self.enabled = True
+        self.min_size = 1024
+        self.mimetypes = set()
+        self.levels = {}
+        self.max_cache_bytes = 0
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'compressed': 0, 'cache_hits': 0, 'cache_misses': 0, 'cache_evictions': 0,
+                          'bytes_in': 0, 'bytes_out': 0}
+
+    def init_app(self, app, name: str = 'compression'):
+        """Configure compression from a Flask app and compress eligible responses"""
+        self.enabled = app.config['COMPRESSION_ENABLED']
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.mimetypes = set(app.config['COMPRESSION_MIMETYPES'])
+        self.levels = {'gzip': app.config['COMPRESSION_GZIP_LEVEL'], 'br': app.config['COMPRESSION_BROTLI_QUALITY']}
+        self.max_cache_bytes = app.config['COMPRESSION_CACHE_MAX_BYTES']
+
+        app.after_request(self.compress_response)
+
+        @app.route(f'/api/healthcheck/{name}', methods=['GET'], endpoint=f'{name}_healthcheck')
+        def compression_healthcheck():
+            return {'status': 'Compression enabled' if self.enabled else 'Compression disabled',
+                    'encodings': self.supported_encodings(), 'stats': self.stats()}, 200
+
+    @staticmethod
+    def supported_encodings():
+        """Get the content encodings available in this process, preferred first"""
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def negotiate(self) -> Optional[str]:
+        """Pick the best content encoding accepted by the client, or None"""
+        for encoding in self.supported_encodings():
+            if request.accept_encodings[encoding] > 0:
+                return encoding
+        return None
+
+    def compress_response(self, response):
+        """Compress an eligible response, reusing a cached body when its ETag was seen before"""
+        if not self.enabled or request.method == 'HEAD':
+            return response
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return response
+        if response.mimetype not in self.mimetypes or 'Content-Encoding' in response.headers:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = self.negotiate()
+        if encoding is None or (response.content_length or 0) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        cache_key = (etag, encoding) if etag and not weak else None
+
+        body = self._cache_get(cache_key) if cache_key else None
+        if body is None:
+            data = response.get_data()
+            body = compress(data, encoding, self.levels[encoding])
+            with self._lock:
+                self._counters['compressed'] += 1
+                self._counters['bytes_in'] += len(data)
+            if cache_key:
+                self._cache_set(cache_key, body)
+
+        with self._lock:
+            self._counters['bytes_out'] += len(body)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag_variant(etag, encoding), weak=weak)
+        return response
+
+    def _cache_get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._cache.get(key)
+            if body is None:
+                self._counters['cache_misses'] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._counters['cache_hits'] += 1
+            return body
+
+    def _cache_set(self, key: Tuple, body: bytes) -> None:
+        if len(body) > self.max_cache_bytes:
+            return
+        with self._lock:
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cache_bytes -= len(previous)
+            self._cache[key] = body
+            self._cache_bytes += len(body)
+            while self._cache_bytes > self.max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
+                self._counters['cache_evictions'] += 1
+
+    def clear(self) -> None:
+        """Drop every cached compressed body"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    def stats(self) -> Dict:
+        """
+        Get compression and cache counters.
+
+        Returns:
+            Dictionary with cache usage and byte counters
+        """
+        with self._lock:
+            return {
+                'cache_entries': len(self._cache),
+                'cache_bytes': self._cache_bytes,
+                'max_cache_bytes': self.max_cache_bytes,
+                'min_size': self.min_size,
+                **self._counters
+            }
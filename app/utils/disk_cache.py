@@ -0,0 +1,175 @@
+"""
+Disk cache utilities.
+Contains a small file-system cache for binary payloads such as vector tiles.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional, Sequence
+
+# Eviction removes entries until the cache is below this share of its byte limit
+EVICTION_LOW_WATER = 0.9
+
+
+class DiskCache:
+    def __init__(self, root: str, suffix: str = '', max_bytes: int = 0):
+        """
+        Create a cache rooted at a directory.
+        
+        Args:
+            root: Directory holding the cached files
+            suffix: File extension appended to every cached entry
+            max_bytes: Size limit of the cache; least recently used entries are evicted above it (0 = unbounded)
+        """
+        self.root = root
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+    
+    def path_for(self, key: Sequence) -> str:
+        """
+        Get the file path of a cache entry.
+        
+        Args:
+            key: Sequence of key parts, each one becomes a path segment
+            
+        Returns:
+            Absolute path of the entry
+        """
+        parts = [str(part) for part in key]
+        return os.path.join(self.root, *parts[:-1], parts[-1] + self.suffix)
+    
+    def get(self, key: Sequence) -> Optional[bytes]:
+        """
+        Read a cache entry.
+        
+        Args:
+            key: Sequence of key parts
+            
+        Returns:
+            Cached bytes or None on a miss
+        """
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        
+        if self.max_bytes:
+            # The modification time doubles as the last use for eviction
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return data
+    
+    def set(self, key: Sequence, data: bytes) -> str:
+        """
+        Write a cache entry atomically, so readers never see a partial file.
+        
+        Args:
+            key: Sequence of key parts
+            data: Payload to store
+            
+        Returns:
+            Path of the written entry
+        """
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        if self.max_bytes:
+            self._account(len(data))
+        return path
+    
+    def invalidate(self, prefix: Sequence = ()) -> None:
+        """
+        Remove every entry whose key starts with the given parts.
+        
+        Args:
+            prefix: Leading key parts; an empty prefix clears the whole cache
+        """
+        path = os.path.join(self.root, *[str(part) for part in prefix])
+        shutil.rmtree(path, ignore_errors=True)
+        with self._lock:
+            self._size = None
+    
+    def retain(self, prefix: Sequence, keep) -> None:
+        """
+        Remove every entry under a prefix except the ones continuing with a given key part,
+        e.g. all but the current version of an object's entries.
+        
+        Args:
+            prefix: Leading key parts
+            keep: Key part following the prefix whose entries are kept
+        """
+        path = os.path.join(self.root, *[str(part) for part in prefix])
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:
+            return
+        
+        stale = [name for name in names if name != str(keep) and not name.startswith('.tmp-')]
+        for name in stale:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        if stale:
+            with self._lock:
+                self._size = None
+    
+    def _account(self, added: int) -> None:
+        """Track the size of the cache and evict once it exceeds max_bytes"""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += added
+            if self._size > self.max_bytes:
+                self._size = self._evict(int(self.max_bytes * EVICTION_LOW_WATER))
+    
+    def _entries(self):
+        """List (mtime, path, size) of every cached file"""
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+    
+    def _evict(self, target: int) -> int:
+        """
+        Remove the least recently used entries until the cache is at most target bytes.
+        The size is measured on disk, so entries written by other processes count too.
+        
+        Returns:
+            Size of the cache after eviction
+        """
+        entries = sorted(self._entries())
+        size = sum(entry[2] for entry in entries)
+        for _, path, entry_size in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+                size -= entry_size
+            except OSError:
+                pass
+        return size
@@ -0,0 +1,72 @@
+"""
+ETag utilities.
+Contains helpers for strong ETags and conditional GET handling.
+"""
+import functools
+import hashlib
+from typing import Any, Callable, Optional
+from flask import request, make_response, Response
+
+
+def compute_etag(*parts: Any) -> str:
+    """
+    Compute a strong ETag from content version parts and the requested URL.
+    The query string is included, so every representation gets its own tag.
+    
+    Args:
+        parts: Values identifying the version of the underlying content
+        
+    Returns:
+        ETag value without quotes
+    """
+    source = '|'.join(str(part) for part in (*parts, request.full_path))
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
+
+
+def check_not_modified(etag: str) -> Optional[Response]:
+    """
+    Answer a conditional GET before any work is done.
+    Tags of compressed variants (see compression_utils.etag_variant) match too.
+    
+    Args:
+        etag: ETag of the current representation
+        
+    Returns:
+        304 response if the client already has this representation, None otherwise
+    """
+    if request.if_none_match.star_tag:
+        matched = etag
+    else:
+        matched = next((tag for tag in request.if_none_match.as_set()
+                        if tag == etag or tag.startswith(etag + '-')), None)
+    
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+        return response
+    return None
+
+
+def conditional_response(view: Callable) -> Callable:
+    """
+    Decorate a view so successful responses carry a strong ETag and
+    If-None-Match requests are answered with 304. Views that already set
+    an ETag keep it; otherwise it is derived from the response body.
+    
+    Args:
+        view: Flask view function
+        
+    Returns:
+        Wrapped view function
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        
+        if not response.get_etag()[0]:
+            response.add_etag()
+        
+        return check_not_modified(response.get_etag()[0]) or response
+    return wrapper
@@ -3,7 +3,11 @@ Geo utilities.
 Contains helper functions for working with geographic data.
 """
 import math
-from typing import Tuple, List, Dict, Union
+from typing import Tuple, List, Dict, Union, Sequence
+import numpy as np
+from app.utils.json_provider import dumps_text
+
+EARTH_RADIUS_KM = 6371.0
 
 def calculate_distance(point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
     """
@@ -16,7 +20,7 @@ def calculate_distance(point1: Tuple[float, float], point2: Tuple[float, float])
     Returns:
         Distance in kilometers
     """
-    R = 6371.0
+    R = EARTH_RADIUS_KM
     
     lon1, lat1 = point1
     lon2, lat2 = point2
@@ -35,6 +39,63 @@ def calculate_distance(point1: Tuple[float, float], point2: Tuple[float, float])
     
     return distance
 
+def calculate_distances(origin: Tuple[float, float],
+                        points: Union[Sequence[Tuple[float, float]], np.ndarray]) -> np.ndarray:
+    """
+    Calculate Haversine distances in km from one origin to many points at once.
+    
+    Args:
+        origin: (longitude, latitude) of the origin
+        points: Sequence or (N, 2) array of (longitude, latitude) pairs
+        
+    Returns:
+        Array of N distances in kilometers
+    """
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if coords.shape[0] == 0:
+        return np.empty(0, dtype=np.float64)
+    
+    lon1, lat1 = np.radians(origin[0]), np.radians(origin[1])
+    lon2 = np.radians(coords[:, 0])
+    lat2 = np.radians(coords[:, 1])
+    
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return EARTH_RADIUS_KM * c
+
+def zoom_to_tolerance(zoom: float, pixels: float = 1.0, tile_size: int = 256) -> float:
+    """
+    Convert a web map zoom level to a simplification tolerance in degrees.
+    
+    Args:
+        zoom: Web Mercator zoom level
+        pixels: Number of screen pixels a removed vertex may deviate by
+        tile_size: Tile size in pixels
+        
+    Returns:
+        Tolerance in degrees of longitude
+    """
+    return 360.0 / (tile_size * 2 ** zoom) * pixels
+
+def select_lod_level(zoom: int, levels: Sequence[int]) -> Union[int, None]:
+    """
+    Pick the precomputed level of detail to serve for a zoom level.
+    The coarsest level that is still at least as detailed as the zoom is used.
+    
+    Args:
+        zoom: Requested zoom level
+        levels: Zoom levels that have precomputed geometry
+        
+    Returns:
+        Zoom level of the LOD variant, or None if full resolution is needed
+    """
+    candidates = [level for level in levels if level >= zoom]
+    return min(candidates) if candidates else None
+
 def format_as_geojson(features: List[Dict]) -> Dict:
     """
     Format a list of features as a GeoJSON FeatureCollection.
@@ -49,3 +110,17 @@ def format_as_geojson(features: List[Dict]) -> Dict:
         "type": "FeatureCollection",
         "features": features
     }
+
+def encode_feature(geometry_json: str, properties: Dict) -> str:
+    """
+    Encode a GeoJSON Feature as JSON text around an already encoded geometry.
+    
+    Args:
+        geometry_json: Geometry as JSON text, e.g. the output of ST_AsGeoJSON
+        properties: Feature properties
+        
+    Returns:
+        GeoJSON Feature as JSON text
+    """
+    return ('{"type": "Feature", "geometry": ' + geometry_json +
+            ', "properties": ' + dumps_text(properties) + '}')
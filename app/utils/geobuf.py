@@ -0,0 +1,212 @@
+"""
+Geobuf utilities.
+Contains an encoder for the Geobuf format (https://github.com/mapbox/geobuf),
+a compact protobuf encoding of GeoJSON with quantized, delta-encoded coordinates.
+"""
+import json
+import struct
+from typing import Dict, Iterable, Optional
+
+GEOBUF_MIMETYPE = 'application/geobuf'
+
+GEOMETRY_TYPES = {
+    'Point': 0,
+    'MultiPoint': 1,
+    'LineString': 2,
+    'MultiLineString': 3,
+    'Polygon': 4,
+    'MultiPolygon': 5,
+    'GeometryCollection': 6
+}
+
+DEFAULT_PRECISION = 6
+
+_VARINT = 0
+_FIXED64 = 1
+_BYTES = 2
+
+
+def _write_varint(buf: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _write_tag(buf: bytearray, field: int, wire_type: int) -> None:
+    _write_varint(buf, (field << 3) | wire_type)
+
+
+def _write_bytes_field(buf: bytearray, field: int, data: bytes) -> None:
+    _write_tag(buf, field, _BYTES)
+    _write_varint(buf, len(data))
+    buf.extend(data)
+
+
+def _write_packed_varint(buf: bytearray, field: int, values: Iterable[int], signed: bool = False) -> None:
+    packed = bytearray()
+    for value in values:
+        _write_varint(packed, _zigzag(value) if signed else value)
+    if packed:
+        _write_bytes_field(buf, field, packed)
+
+
+class GeobufEncoder:
+    def __init__(self, precision: int = DEFAULT_PRECISION, dimensions: int = 2):
+        """
+        Create an encoder.
+
+        Args:
+            precision: Number of decimal digits kept when quantizing coordinates
+            dimensions: Number of coordinate dimensions (2 or 3)
+        """
+        self.precision = precision
+        self.dimensions = dimensions
+        self.factor = 10 ** precision
+        self.keys = {}
+
+    def encode_feature_collection(self, features: Iterable[Dict], custom_properties: Optional[Dict] = None) -> bytes:
+        """
+        Encode GeoJSON features as a Geobuf FeatureCollection.
+
+        Args:
+            features: GeoJSON Feature dictionaries
+            custom_properties: Extra top-level FeatureCollection members, e.g. metadata
+
+        Returns:
+            Geobuf document
+        """
+        collection = bytearray()
+        for feature in features:
+            _write_bytes_field(collection, 1, self._encode_feature(feature))
+        if custom_properties:
+            self._write_properties(collection, custom_properties, 15)
+
+        data = bytearray()
+        for key in self.keys:
+            _write_bytes_field(data, 1, key.encode('utf-8'))
+        # Written even when equal to the protobuf defaults, as some decoders ignore them
+        _write_tag(data, 2, _VARINT)
+        _write_varint(data, self.dimensions)
+        _write_tag(data, 3, _VARINT)
+        _write_varint(data, self.precision)
+        _write_bytes_field(data, 4, collection)
+
+        return bytes(data)
+
+    def _encode_feature(self, feature: Dict) -> bytes:
+        buf = bytearray()
+        _write_bytes_field(buf, 1, self._encode_geometry(feature['geometry']))
+
+        feature_id = feature.get('id')
+        if isinstance(feature_id, int) and not isinstance(feature_id, bool):
+            _write_tag(buf, 12, _VARINT)
+            _write_varint(buf, _zigzag(feature_id))
+        elif feature_id is not None:
+            _write_bytes_field(buf, 11, str(feature_id).encode('utf-8'))
+
+        self._write_properties(buf, feature.get('properties') or {}, 14)
+        return bytes(buf)
+
+    def _write_properties(self, buf: bytearray, properties: Dict, field: int) -> None:
+        """Write values (field 13) and key/value index pairs; null values are skipped"""
+        indexes = []
+        value_index = 0
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in self.keys:
+                self.keys[key] = len(self.keys)
+            _write_bytes_field(buf, 13, self._encode_value(value))
+            indexes.extend((self.keys[key], value_index))
+            value_index += 1
+        _write_packed_varint(buf, field, indexes)
+
+    @staticmethod
+    def _encode_value(value) -> bytes:
+        buf = bytearray()
+        if isinstance(value, str):
+            _write_bytes_field(buf, 1, value.encode('utf-8'))
+        elif isinstance(value, bool):
+            _write_tag(buf, 5, _VARINT)
+            _write_varint(buf, int(value))
+        elif isinstance(value, int):
+            _write_tag(buf, 3 if value >= 0 else 4, _VARINT)
+            _write_varint(buf, abs(value))
+        elif isinstance(value, float):
+            _write_tag(buf, 2, _FIXED64)
+            buf.extend(struct.pack('<d', value))
+        else:
+            _write_bytes_field(buf, 6, json.dumps(value, default=str).encode('utf-8'))
+        return bytes(buf)
+
+    def _encode_geometry(self, geometry: Dict) -> bytes:
+        buf = bytearray()
+        geometry_type = geometry['type']
+        _write_tag(buf, 1, _VARINT)
+        _write_varint(buf, GEOMETRY_TYPES[geometry_type])
+
+        if geometry_type == 'GeometryCollection':
+            for child in geometry['geometries']:
+                _write_bytes_field(buf, 4, self._encode_geometry(child))
+            return bytes(buf)
+
+        coordinates = geometry['coordinates']
+        coords = []
+        lengths = None
+
+        if geometry_type == 'Point':
+            coords = [round(c * self.factor) for c in coordinates[:self.dimensions]]
+        elif geometry_type in ('MultiPoint', 'LineString'):
+            self._populate_line(coords, coordinates, closed=False)
+        elif geometry_type in ('MultiLineString', 'Polygon'):
+            closed = geometry_type == 'Polygon'
+            if len(coordinates) != 1:
+                lengths = [len(line) - int(closed) for line in coordinates]
+            for line in coordinates:
+                self._populate_line(coords, line, closed)
+        elif geometry_type == 'MultiPolygon':
+            if len(coordinates) != 1 or len(coordinates[0]) != 1:
+                lengths = [len(coordinates)]
+                for polygon in coordinates:
+                    lengths.append(len(polygon))
+                    lengths.extend(len(ring) - 1 for ring in polygon)
+            for polygon in coordinates:
+                for ring in polygon:
+                    self._populate_line(coords, ring, closed=True)
+
+        if lengths is not None:
+            _write_packed_varint(buf, 2, lengths)
+        _write_packed_varint(buf, 3, coords, signed=True)
+        return bytes(buf)
+
+    def _populate_line(self, coords: list, line: list, closed: bool) -> None:
+        """Append quantized coordinates of a line, delta-encoded from its first vertex"""
+        dimensions = self.dimensions
+        factor = self.factor
+        last = [0] * dimensions
+        for point in line[:len(line) - 1] if closed else line:
+            for j in range(dimensions):
+                value = round(point[j] * factor)
+                coords.append(value - last[j])
+                last[j] = value
+
+
+def encode_geobuf(features: Iterable[Dict], precision: int = DEFAULT_PRECISION,
+                  custom_properties: Optional[Dict] = None) -> bytes:
+    """
+    Encode GeoJSON features as a Geobuf FeatureCollection.
+
+    Args:
+        features: GeoJSON Feature dictionaries
+        precision: Number of decimal digits kept when quantizing coordinates
+        custom_properties: Extra top-level FeatureCollection members, e.g. metadata
+
+    Returns:
+        Geobuf document
+    """
+    return GeobufEncoder(precision).encode_feature_collection(features, custom_properties)
@@ -0,0 +1,152 @@
+"""
+GeoJSON streaming utilities.
+Contains an incremental reader that yields the features of a GeoJSON document
+one at a time from a byte stream, so arbitrarily large uploads are read in
+constant memory.
+"""
+import codecs
+import json
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+WHITESPACE = ' \t\n\r'
+RECORD_SEPARATOR = '\x1e'
+
+
+class GeoJSONStreamError(ValueError):
+    """Raised when the input is not a readable GeoJSON document"""
+
+
+class _Buffer:
+    def __init__(self, stream: BinaryIO, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+        # Characters dropped from the front of the buffer, for error offsets
+        self.consumed = 0
+
+    def fill(self) -> bool:
+        """Read another chunk; returns False at the end of the stream"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if self.pos:
+            self.consumed += self.pos
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        if not chunk:
+            self.eof = True
+            self.text += self.decoder.decode(b'', final=True)
+            return False
+        self.text += self.decoder.decode(chunk)
+        return True
+
+    def skip(self, characters: str = WHITESPACE) -> str:
+        """Skip characters and return the next one, or '' at the end of the stream"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in characters:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, character: str) -> None:
+        found = self.skip()
+        if found != character:
+            raise self.error(f"Expected '{character}'" + (f", found '{found}'" if found else ' before the end'))
+        self.pos += 1
+
+    def value(self, decoder: json.JSONDecoder):
+        """Decode the next JSON value, reading more input until it is complete"""
+        self.skip()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise self.error(e.msg, e.pos)
+            self.fill()
+
+    def error(self, message: str, pos: int = None) -> GeoJSONStreamError:
+        offset = self.consumed + (self.pos if pos is None else pos)
+        return GeoJSONStreamError(f"{message} at character {offset}")
+
+
+def iter_geojson_features(stream: BinaryIO, chunk_size: int = 1 << 16) -> Iterator[Tuple[int, Dict]]:
+    """
+    Iterate over the features of a GeoJSON document without loading it whole.
+    Accepts a FeatureCollection, a single Feature, or a sequence of Features
+    separated by whitespace or RFC 8142 record separators (GeoJSONSeq / NDJSON).
+    Top-level members other than features are skipped.
+
+    Args:
+        stream: Binary file-like object with UTF-8 JSON
+        chunk_size: Bytes read at a time
+
+    Returns:
+        Iterator of (feature index, feature) tuples
+
+    Raises:
+        GeoJSONStreamError: If the input is not well-formed
+    """
+    buffer = _Buffer(stream, chunk_size)
+    decoder = json.JSONDecoder()
+    index = 0
+
+    while buffer.skip(WHITESPACE + RECORD_SEPARATOR):
+        buffer.expect('{')
+        members = {}
+        streamed = False
+
+        if buffer.skip() == '}':
+            buffer.pos += 1
+        else:
+            while True:
+                key = buffer.value(decoder)
+                if not isinstance(key, str):
+                    raise buffer.error("Expected an object key")
+                buffer.expect(':')
+
+                if key == 'features' and members.get('type', 'FeatureCollection') == 'FeatureCollection' \
+                        and buffer.skip() == '[':
+                    buffer.pos += 1
+                    streamed = True
+                    if buffer.skip() == ']':
+                        buffer.pos += 1
+                    else:
+                        while True:
+                            yield index, buffer.value(decoder)
+                            index += 1
+                            separator = buffer.skip()
+                            buffer.pos += 1
+                            if separator == ']':
+                                break
+                            if separator != ',':
+                                raise buffer.error("Expected ',' or ']' in the features array")
+                else:
+                    members[key] = buffer.value(decoder)
+
+                separator = buffer.skip()
+                buffer.pos += 1
+                if separator == '}':
+                    break
+                if separator != ',':
+                    raise buffer.error("Expected ',' or '}'")
+
+        if members.get('type') == 'FeatureCollection':
+            if not streamed and not isinstance(members.get('features'), list):
+                raise GeoJSONStreamError("FeatureCollection without a features array")
+            continue
+
+        # A bare Feature, possibly one of a sequence; members were read in full
+        if streamed:
+            raise GeoJSONStreamError("Only a FeatureCollection may contain a features array")
+        yield index, members
+        index += 1
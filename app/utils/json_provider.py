@@ -0,0 +1,118 @@
+"""
+JSON provider utilities.
+Contains a Flask JSON provider backed by orjson, falling back to the standard
+library when orjson is not installed, and a marker for already encoded JSON
+(e.g. ST_AsGeoJSON geometry) that is embedded in responses without parsing.
+"""
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class RawJSON:
+    """JSON text that is written into the output as is"""
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __getstate__(self):
+        return self.text
+
+    def __setstate__(self, state):
+        self.text = state
+
+    def __repr__(self) -> str:
+        return f"RawJSON({self.text!r})"
+
+
+def raw_json(text: str) -> RawJSON:
+    """
+    Mark JSON text to be embedded in a response without being parsed.
+
+    Args:
+        text: Valid JSON text, e.g. the output of ST_AsGeoJSON
+
+    Returns:
+        Marker serialized as the text itself
+    """
+    return RawJSON(text)
+
+
+def _default(obj: Any) -> Any:
+    """Serialize the types orjson and json do not know, the way Flask's default provider does"""
+    if isinstance(obj, RawJSON):
+        return orjson.Fragment(obj.text) if orjson is not None else json.loads(obj.text)
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_text(obj: Any) -> str:
+    """
+    Encode a value as compact JSON text with the fast encoder.
+    Keys are not sorted and non-ASCII characters are not escaped.
+
+    Args:
+        obj: Value to encode
+
+    Returns:
+        JSON text
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode('utf-8')
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider encoding with orjson. Output matches the default provider's
+    types (HTTP dates, Decimal and UUID as strings, sorted keys) except that
+    non-ASCII characters are written as UTF-8 instead of being escaped.
+    RealDictRow results are dict subclasses and are encoded directly.
+    """
+    default = staticmethod(_default)
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, pretty=False).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, pretty) + b'\n', mimetype=self.mimetype)
+
+    def _encode(self, obj: Any, pretty: bool) -> bytes:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
@@ -0,0 +1,189 @@
+"""
+Metrics utilities.
+Contains in-process request and database query metrics rendered in the
+Prometheus text exposition format. Every worker process keeps its own values.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from flask import Response, g, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 100, 1000, 10000, 100000)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter of a label set"""
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation for a label set"""
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series['buckets']):
+                    cumulative += count
+                    labels = _format_labels(key + (('le', _format_value(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Metrics:
+    def __init__(self, prefix: str = 'urbancityeye'):
+        self.prefix = prefix
+        self.enabled = True
+        self.db = None
+        self.query_latency = Histogram(f'{prefix}_db_query_duration_seconds',
+                                       'Database statement latency', ('operation', 'statement'))
+        self.query_rows = Counter(f'{prefix}_db_rows_total',
+                                  'Rows returned or affected by database statements', ('operation', 'statement'))
+        self.slow_queries = Counter(f'{prefix}_db_slow_queries_total',
+                                    'Database statements slower than DB_SLOW_QUERY_MS', ('operation', 'statement'))
+        self.request_latency = Histogram(f'{prefix}_http_request_duration_seconds',
+                                         'HTTP request latency', ('method', 'route', 'status'))
+        self.response_size = Histogram(f'{prefix}_http_response_size_bytes',
+                                       'HTTP response body size', ('method', 'route'), SIZE_BUCKETS)
+        self.request_queries = Histogram(f'{prefix}_http_request_db_queries',
+                                         'Database statements run per HTTP request', ('method', 'route'),
+                                         COUNT_BUCKETS)
+        self._collectors = (self.query_latency, self.query_rows, self.slow_queries,
+                            self.request_latency, self.response_size, self.request_queries)
+
+    def init_app(self, app, db=None):
+        """Record request metrics for a Flask app and expose them at /api/metrics"""
+        self.enabled = app.config['METRICS_ENABLED']
+        self.db = db
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        @app.route('/api/metrics', methods=['GET'], endpoint='metrics')
+        def metrics_endpoint():
+            return Response(self.render(), mimetype=PROMETHEUS_MIMETYPE)
+
+    def observe_query(self, operation: str, statement: str, duration: float, rows: int, slow: bool) -> None:
+        """
+        Record one database statement.
+
+        Args:
+            operation: DBManager method family, e.g. 'read' or 'prepared'
+            statement: Prepared statement name or query fingerprint
+            duration: Seconds spent in the statement
+            rows: Rows returned or affected
+            slow: Whether the statement exceeded the slow-query threshold
+        """
+        if not self.enabled:
+            return
+        self.query_latency.observe(duration, operation=operation, statement=statement)
+        self.query_rows.inc(rows, operation=operation, statement=statement)
+        if slow:
+            self.slow_queries.inc(operation=operation, statement=statement)
+        if 'metrics_started_at' in g:
+            g.metrics_queries = g.get('metrics_queries', 0) + 1
+
+    @staticmethod
+    def _start_request():
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_queries = 0
+
+    def _finish_request(self, response):
+        started_at = g.get('metrics_started_at')
+        if started_at is None:
+            return response
+
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        self.request_latency.observe(time.perf_counter() - started_at, method=request.method, route=route,
+                                     status=str(response.status_code))
+        self.request_queries.observe(g.get('metrics_queries', 0), method=request.method, route=route)
+        # Streamed bodies have no length until they are sent
+        if response.content_length is not None:
+            self.response_size.observe(response.content_length, method=request.method, route=route)
+        return response
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            Exposition text
+        """
+        lines = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        lines.extend(self._render_pool_stats())
+        return '\n'.join(lines) + '\n'
+
+    def _render_pool_stats(self) -> List[str]:
+        stats: Optional[Dict] = self.db.pool_stats() if self.db is not None else None
+        if not stats:
+            return []
+        lines = []
+        for key, value in sorted(stats.items()):
+            if key != 'pid' and isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f"{self.prefix}_db_pool_{key}"
+                lines.extend([f"# TYPE {name} gauge", f"{name} {_format_value(value)}"])
+        return lines
@@ -3,7 +3,11 @@ Response utilities.
 Contains functions for creating standardized API responses.
 """
 from typing import Dict, Any, Optional, List, Union
-from flask import jsonify
+import base64
+import binascii
+import json
+from flask import jsonify, request, current_app, Response
+from app.utils.json_provider import dumps_text
 
 def create_error_response(message: str, status_code: int = 400, errors: Optional[List[Dict]] = None) -> Dict:
     """
@@ -51,6 +55,109 @@ def create_success_response(data: Any = None, message: str = "Success", meta: Op
     
     return jsonify(response)
 
+def create_raw_success_response(raw_data: str, message: str = "Success", meta: Optional[Dict] = None) -> Response:
+    """
+    Create a standardized success response around an already encoded JSON document.
+    The document is embedded as-is without being parsed or re-serialized.
+    
+    Args:
+        raw_data: Response data as JSON text
+        message: Success message
+        meta: Additional metadata
+        
+    Returns:
+        Flask response with the success envelope
+    """
+    body = '{"success": true, "message": ' + dumps_text(message) + ', "data": ' + raw_data
+    
+    if meta:
+        body += ', "meta": ' + dumps_text(meta)
+    
+    return Response(body + '}', mimetype='application/json')
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Encode an opaque keyset pagination cursor.
+    
+    Args:
+        last_id: ID of the last item on the current page
+        
+    Returns:
+        URL-safe continuation token
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": last_id}).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token: str) -> int:
+    """
+    Decode a keyset pagination cursor created by encode_cursor.
+    
+    Args:
+        token: Continuation token
+        
+    Returns:
+        ID after which the next page starts
+        
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        after_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))['after']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+        raise ValueError("Invalid pagination cursor")
+    
+    if not isinstance(after_id, int) or isinstance(after_id, bool):
+        raise ValueError("Invalid pagination cursor")
+    
+    return after_id
+
+def get_keyset_page_args() -> tuple:
+    """
+    Read keyset pagination arguments (limit, cursor) from the current request.
+    
+    Returns:
+        (after_id, limit) tuple; both are None when the request is not paginated
+        
+    Raises:
+        ValueError: If limit or cursor is invalid
+    """
+    after_id = None
+    limit = None
+    
+    if 'cursor' in request.args:
+        after_id = decode_cursor(request.args['cursor'])
+    
+    if 'limit' in request.args or after_id is not None:
+        # Without a default, a limit that is not an integer reads as None instead of the default
+        limit = request.args.get('limit', type=int)
+        if 'limit' not in request.args:
+            limit = current_app.config['PAGINATION_DEFAULT_LIMIT']
+        if limit is None or not 1 <= limit <= current_app.config['PAGINATION_MAX_LIMIT']:
+            raise ValueError("Invalid page limit")
+    
+    return after_id, limit
+
+def create_page_meta(items_count: int, last_id: Optional[int], limit: int) -> Dict:
+    """
+    Create pagination metadata for a keyset page.
+    A full page gets a cursor for the next one; nothing past the page is fetched
+    to find out whether more items exist.
+    
+    Args:
+        items_count: Number of items on the page
+        last_id: ID of the last item on the page
+        limit: Requested page size
+        
+    Returns:
+        Pagination metadata with the opaque next_cursor
+    """
+    has_more = items_count == limit and last_id is not None
+    return {
+        "limit": limit,
+        "count": items_count,
+        "next_cursor": encode_cursor(last_id) if has_more else None
+    }
+
 def paginate_results(results: List, page: int = 1, page_size: int = 20) -> Dict:
     """
     Create a paginated response.
@@ -0,0 +1,156 @@
+"""
+Snapshot store utilities.
+Contains an on-disk store of complete response bodies, written once per
+content version together with their gzip and brotli encodings so they can be
+served as files without being read into Python memory.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Dict, Hashable, Iterable, Optional, Union
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class _Writer:
+    """Writes one encoding of a body to a temporary file next to its final path"""
+
+    def __init__(self, directory: str, encoding: Optional[str], level: int):
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        self.file = os.fdopen(fd, 'wb')
+        self.encoding = encoding
+        self.compressor = None
+        if encoding == 'gzip':
+            self.compressor = gzip.GzipFile(fileobj=self.file, mode='wb', compresslevel=level, mtime=0)
+        elif encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+
+    def write(self, data: bytes) -> None:
+        if self.encoding == 'gzip':
+            self.compressor.write(data)
+        elif self.encoding == 'br':
+            self.file.write(self.compressor.process(data))
+        else:
+            self.file.write(data)
+
+    def close(self) -> None:
+        if self.encoding == 'gzip':
+            self.compressor.close()
+        elif self.encoding == 'br':
+            self.file.write(self.compressor.finish())
+        self.file.close()
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+class SnapshotStore:
+    def __init__(self, root: str, suffix: str = '.json'):
+        """
+        Create a store rooted at a directory.
+
+        Args:
+            root: Directory holding one subdirectory of snapshot files per key
+            suffix: File extension of the identity encoding
+        """
+        self.root = os.path.abspath(root)
+        self.suffix = suffix
+
+    @staticmethod
+    def encodings() -> list:
+        """Get the content encodings written next to the identity body, preferred first"""
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def path_for(self, key: Hashable, version: str, encoding: Optional[str] = None) -> str:
+        """
+        Get the file path of a snapshot.
+
+        Args:
+            key: Snapshot key, e.g. the simulation ID
+            version: Content version of the snapshot
+            encoding: None for the identity body, 'gzip' or 'br'
+
+        Returns:
+            Absolute path of the file
+        """
+        digest = hashlib.sha1(str(version).encode()).hexdigest()[:20]
+        extension = {None: '', 'gzip': '.gz', 'br': '.br'}[encoding]
+        return os.path.join(self.root, str(key), digest + self.suffix + extension)
+
+    def find(self, key: Hashable, version: str, encoding: Optional[str] = None) -> Optional[str]:
+        """
+        Look up a snapshot file.
+
+        Args:
+            key: Snapshot key
+            version: Content version the snapshot has to match
+            encoding: None for the identity body, 'gzip' or 'br'
+
+        Returns:
+            Path of the file or None if there is no snapshot of that version
+        """
+        path = self.path_for(key, version, encoding)
+        return path if os.path.isfile(path) else None
+
+    def write(self, key: Hashable, version: str, chunks: Iterable[Union[str, bytes]],
+              levels: Dict[str, int]) -> int:
+        """
+        Write a snapshot and its compressed encodings from body chunks, atomically,
+        and remove the snapshots of older versions of the key. Chunks are written
+        as they arrive, so the body never has to fit into memory.
+
+        Args:
+            key: Snapshot key
+            version: Content version of the body
+            chunks: Iterable of body chunks
+            levels: Compression level per encoding ('gzip', 'br')
+
+        Returns:
+            Size of the identity body in bytes
+        """
+        directory = os.path.dirname(self.path_for(key, version))
+        os.makedirs(directory, exist_ok=True)
+
+        writers = [_Writer(directory, encoding, levels.get(encoding, 6)) for encoding in [None] + self.encodings()]
+        size = 0
+        try:
+            for chunk in chunks:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                size += len(data)
+                for writer in writers:
+                    writer.write(data)
+            for writer in writers:
+                writer.close()
+            # The identity file is published last; its presence marks a complete snapshot
+            for writer in reversed(writers):
+                os.replace(writer.tmp_path, self.path_for(key, version, writer.encoding))
+        except BaseException:
+            for writer in writers:
+                writer.discard()
+            raise
+
+        current = {os.path.basename(self.path_for(key, version, writer.encoding)) for writer in writers}
+        for entry in os.scandir(directory):
+            if entry.name not in current and not entry.name.startswith('.tmp-'):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+        return size
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Remove snapshots.
+
+        Args:
+            key: Only remove the snapshots of this key; None clears the whole store
+        """
+        path = os.path.join(self.root, str(key)) if key is not None else self.root
+        shutil.rmtree(path, ignore_errors=True)
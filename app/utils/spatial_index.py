@@ -0,0 +1,255 @@
+"""
+Spatial index utilities.
+Contains an STR-packed R-tree over bounding boxes and a size-bounded LRU cache
+of per-simulation indexes holding pre-serialized GeoJSON feature fragments.
+"""
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _str_order(boxes: np.ndarray, node_capacity: int) -> np.ndarray:
+    """Sort-Tile-Recursive order: vertical slices by x center, then y center within each slice"""
+    count = len(boxes)
+    slices = max(1, math.ceil(math.sqrt(math.ceil(count / node_capacity))))
+    slice_size = slices * node_capacity
+
+    centers_x = boxes[:, 0] + boxes[:, 2]
+    centers_y = boxes[:, 1] + boxes[:, 3]
+    rank_x = np.empty(count, dtype=np.int64)
+    rank_x[np.argsort(centers_x, kind='stable')] = np.arange(count)
+    return np.lexsort((centers_y, rank_x // slice_size))
+
+
+class STRTree:
+    def __init__(self, boxes: Sequence[Sequence[float]], node_capacity: int = 16):
+        """
+        Bulk-load an R-tree with the Sort-Tile-Recursive algorithm.
+
+        Args:
+            boxes: Item bounding boxes as (minx, miny, maxx, maxy)
+            node_capacity: Maximum number of children per node
+        """
+        self.node_capacity = node_capacity
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.size = len(boxes)
+
+        # Every level holds the boxes of its entries in packed order and the ids they
+        # point to (items at level 0, nodes of the level below otherwise). Consecutive
+        # runs of node_capacity entries form one node of the level above.
+        self.levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        entry_ids = np.arange(self.size)
+        while True:
+            order = _str_order(boxes, node_capacity)
+            boxes, entry_ids = boxes[order], entry_ids[order]
+            self.levels.append((boxes, entry_ids))
+            if len(boxes) <= node_capacity:
+                break
+
+            starts = np.arange(0, len(boxes), node_capacity)
+            boxes = np.column_stack((
+                np.minimum.reduceat(boxes[:, 0], starts),
+                np.minimum.reduceat(boxes[:, 1], starts),
+                np.maximum.reduceat(boxes[:, 2], starts),
+                np.maximum.reduceat(boxes[:, 3], starts),
+            ))
+            entry_ids = np.arange(len(starts))
+
+    def query(self, bbox: Sequence[float]) -> np.ndarray:
+        """
+        Find the items whose bounding box intersects a box.
+
+        Args:
+            bbox: Query box as (minx, miny, maxx, maxy)
+
+        Returns:
+            Sorted array of item indices
+        """
+        if not self.size:
+            return np.empty(0, dtype=np.int64)
+
+        minx, miny, maxx, maxy = bbox
+        offsets = np.arange(self.node_capacity)
+        nodes = np.zeros(1, dtype=np.int64)
+        for boxes, entry_ids in reversed(self.levels):
+            entries = (nodes[:, None] * self.node_capacity + offsets).ravel()
+            entries = entries[entries < len(boxes)]
+            candidate = boxes[entries]
+            hits = entries[(candidate[:, 0] <= maxx) & (candidate[:, 2] >= minx) &
+                           (candidate[:, 1] <= maxy) & (candidate[:, 3] >= miny)]
+            nodes = entry_ids[hits]
+            if not len(nodes):
+                break
+        return np.sort(nodes)
+
+
+class SimulationIndex:
+    def __init__(self, ids: Iterable[int], boxes: Iterable[Sequence[float]], fragments: List[str],
+                 node_capacity: int = 16):
+        """
+        Index the features of one simulation.
+
+        Args:
+            ids: Object IDs in ascending order
+            boxes: Object bounding boxes as (minx, miny, maxx, maxy)
+            fragments: GeoJSON Feature JSON text of every object
+            node_capacity: R-tree node capacity
+        """
+        self.ids = np.fromiter(ids, dtype=np.int64)
+        self.fragments = fragments
+        self.tree = STRTree(list(boxes), node_capacity)
+        self.nbytes = sum(len(fragment) for fragment in fragments) + self.ids.nbytes + \
+            sum(boxes.nbytes + entry_ids.nbytes for boxes, entry_ids in self.tree.levels)
+
+    def query(self, bbox: Sequence[float], after_id: Optional[int] = None,
+              limit: Optional[int] = None) -> Tuple[List[int], List[str]]:
+        """
+        Find the features whose bounding box intersects a box, in ID order.
+
+        Args:
+            bbox: Query box as (minx, miny, maxx, maxy)
+            after_id: Only return objects with a higher ID
+            limit: Maximum number of features
+
+        Returns:
+            (object IDs, feature fragments) tuple
+        """
+        indices = self.tree.query(bbox)
+        if after_id is not None:
+            indices = indices[self.ids[indices] > after_id]
+        if limit is not None:
+            indices = indices[:limit]
+        return self.ids[indices].tolist(), [self.fragments[i] for i in indices.tolist()]
+
+
+class SpatialIndexCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, node_capacity: int = 16):
+        """
+        Create a cache of simulation indexes.
+
+        Args:
+            max_bytes: Approximate memory budget; least recently used indexes are evicted past it
+            node_capacity: R-tree node capacity of new indexes
+        """
+        self.max_bytes = max_bytes
+        self.node_capacity = node_capacity
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        self._oversized = {}
+        self._counters = {'hits': 0, 'misses': 0, 'builds': 0, 'evictions': 0, 'oversized': 0,
+                          'invalidations': 0}
+
+    def init_app(self, app, name: str = 'spatial-index'):
+        """Configure the cache from a Flask app and expose its statistics"""
+        self.max_bytes = app.config['SPATIAL_INDEX_MAX_BYTES']
+        self.node_capacity = app.config['SPATIAL_INDEX_NODE_CAPACITY']
+        self.clear()
+
+        @app.route(f'/api/healthcheck/{name}', methods=['GET'], endpoint=f'{name}_healthcheck')
+        def spatial_index_healthcheck():
+            enabled = app.config['SPATIAL_INDEX_ENABLED']
+            return {'status': 'Spatial index enabled' if enabled else 'Spatial index disabled',
+                    'stats': self.stats()}, 200
+
+    def get(self, key: Hashable, version: str,
+            build: Callable[[int], Optional[SimulationIndex]]) -> Optional[SimulationIndex]:
+        """
+        Get the index of a key at a content version, building it on first use.
+        Concurrent requests for the same missing index wait for a single build.
+
+        Args:
+            key: Cache key, e.g. the simulation ID
+            version: Content version; an index built for another version is rebuilt
+            build: Called with node_capacity to build the index; may return None
+
+        Returns:
+            Index, or None if it could not be built or does not fit into the budget
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return entry[1]
+            self._counters['misses'] += 1
+            if self._oversized.get(key) == version:
+                return None
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    return entry[1]
+
+            index = build(self.node_capacity)
+            with self._lock:
+                self._counters['builds'] += 1
+                self._building.pop(key, None)
+                if index is None:
+                    return None
+                if index.nbytes > self.max_bytes:
+                    # Not built again until the content changes
+                    self._oversized[key] = version
+                    self._counters['oversized'] += 1
+                    return index
+                self._store(key, version, index)
+            return index
+
+    def _store(self, key: Hashable, version: str, index: SimulationIndex) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1].nbytes
+        self._entries[key] = (version, index)
+        self._bytes += index.nbytes
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._counters['evictions'] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Drop cached indexes.
+
+        Args:
+            key: Only drop the index of this key; None drops everything
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._oversized.clear()
+                self._bytes = 0
+            else:
+                self._oversized.pop(key, None)
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry[1].nbytes
+            self._counters['invalidations'] += 1
+
+    def clear(self) -> None:
+        """Drop every index without counting an invalidation"""
+        with self._lock:
+            self._entries.clear()
+            self._oversized.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """
+        Get cache usage counters.
+
+        Returns:
+            Dictionary with memory use, limits and hit/miss counters
+        """
+        with self._lock:
+            return {
+                'indexes': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'objects': sum(len(index.ids) for _, index in self._entries.values()),
+                **self._counters
+            }
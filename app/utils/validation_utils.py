@@ -2,8 +2,10 @@
 Validation utilities.
 Contains functions for validating input data.
 """
-from typing import Dict, List, Any, Optional, Union
+from typing import BinaryIO, Dict, Iterator, List, Any, Optional, Tuple, Union
+import math
 import re
+from app.utils.geojson_stream import iter_geojson_features, GeoJSONStreamError
 
 def validate_geojson(geojson: Dict) -> bool:
     """
@@ -64,6 +66,173 @@ def validate_geojson_feature(feature: Dict) -> bool:
     
     return True
 
+GEOMETRY_TYPES = ('Point', 'MultiPoint', 'LineString', 'MultiLineString', 'Polygon', 'MultiPolygon')
+
+def _error(index: Optional[int], path: str, message: str) -> Dict:
+    return {'feature': index, 'path': path, 'error': message}
+
+def _position_errors(position: Any, path: str, index: Optional[int]) -> List[Dict]:
+    if not isinstance(position, list):
+        return [_error(index, path, "Position must be an array")]
+    if not 2 <= len(position) <= 3:
+        return [_error(index, path, f"Position must have 2 or 3 elements, has {len(position)}")]
+    for value in position:
+        # bool is an int subclass, and NaN/Infinity are accepted by the JSON parser
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return [_error(index, path, "Position elements must be finite numbers")]
+
+    errors = []
+    if not -180 <= position[0] <= 180:
+        errors.append(_error(index, f"{path}[0]", f"Longitude {position[0]} is out of range [-180, 180]"))
+    if not -90 <= position[1] <= 90:
+        errors.append(_error(index, f"{path}[1]", f"Latitude {position[1]} is out of range [-90, 90]"))
+    return errors
+
+def _positions_errors(positions: Any, path: str, index: Optional[int], minimum: int) -> List[Dict]:
+    if not isinstance(positions, list):
+        return [_error(index, path, "Expected an array of positions")]
+    if len(positions) < minimum:
+        return [_error(index, path, f"Expected at least {minimum} positions, found {len(positions)}")]
+
+    errors = []
+    for i, position in enumerate(positions):
+        errors.extend(_position_errors(position, f"{path}[{i}]", index))
+    return errors
+
+def _ring_errors(ring: Any, path: str, index: Optional[int]) -> List[Dict]:
+    errors = _positions_errors(ring, path, index, 4)
+    if not errors and ring[0] != ring[-1]:
+        errors.append(_error(index, path, "Linear ring is not closed"))
+    return errors
+
+def _coordinates_errors(geometry_type: str, coordinates: Any, path: str, index: Optional[int]) -> List[Dict]:
+    if geometry_type == 'Point':
+        return _position_errors(coordinates, path, index)
+    if geometry_type == 'MultiPoint':
+        return _positions_errors(coordinates, path, index, 0)
+    if geometry_type == 'LineString':
+        return _positions_errors(coordinates, path, index, 2)
+
+    if not isinstance(coordinates, list):
+        return [_error(index, path, "Coordinates must be an array")]
+    errors = []
+    for i, part in enumerate(coordinates):
+        part_path = f"{path}[{i}]"
+        if geometry_type == 'MultiLineString':
+            errors.extend(_positions_errors(part, part_path, index, 2))
+        elif geometry_type == 'Polygon':
+            errors.extend(_ring_errors(part, part_path, index))
+        elif not isinstance(part, list):
+            errors.append(_error(index, part_path, "Polygon must be an array of linear rings"))
+        else:
+            for j, ring in enumerate(part):
+                errors.extend(_ring_errors(ring, f"{part_path}[{j}]", index))
+    return errors
+
+def geometry_errors(geometry: Any, path: str = 'geometry', index: Optional[int] = None) -> List[Dict]:
+    """
+    Check a GeoJSON geometry, including the structure and range of its coordinates.
+
+    Args:
+        geometry: GeoJSON geometry object
+        path: Path of the geometry within the document, used in error reports
+        index: Feature index, used in error reports
+
+    Returns:
+        List of errors as {'feature', 'path', 'error'} dictionaries; empty if valid
+    """
+    if not isinstance(geometry, dict):
+        return [_error(index, path, "Geometry must be an object")]
+
+    geometry_type = geometry.get('type')
+    if geometry_type == 'GeometryCollection':
+        geometries = geometry.get('geometries')
+        if not isinstance(geometries, list):
+            return [_error(index, f"{path}.geometries", "GeometryCollection must have a geometries array")]
+        errors = []
+        for i, member in enumerate(geometries):
+            errors.extend(geometry_errors(member, f"{path}.geometries[{i}]", index))
+        return errors
+
+    if geometry_type not in GEOMETRY_TYPES:
+        return [_error(index, f"{path}.type", f"Unknown geometry type {geometry_type!r}")]
+    if 'coordinates' not in geometry:
+        return [_error(index, f"{path}.coordinates", "Geometry has no coordinates")]
+    return _coordinates_errors(geometry_type, geometry['coordinates'], f"{path}.coordinates", index)
+
+def feature_errors(feature: Any, index: Optional[int] = None) -> List[Dict]:
+    """
+    Check a GeoJSON Feature, including its geometry.
+
+    Args:
+        feature: GeoJSON Feature to check
+        index: Feature index, used in error reports
+
+    Returns:
+        List of errors as {'feature', 'path', 'error'} dictionaries; empty if valid
+    """
+    if not isinstance(feature, dict):
+        return [_error(index, '', "Feature must be an object")]
+
+    errors = []
+    if feature.get('type') != 'Feature':
+        errors.append(_error(index, 'type', f"Expected type 'Feature', found {feature.get('type')!r}"))
+    if 'properties' not in feature or not isinstance(feature['properties'], (dict, type(None))):
+        errors.append(_error(index, 'properties', "Feature must have a properties object or null"))
+    if 'geometry' not in feature or feature['geometry'] is None:
+        errors.append(_error(index, 'geometry', "Feature has no geometry"))
+    else:
+        errors.extend(geometry_errors(feature['geometry'], 'geometry', index))
+    return errors
+
+def iter_validated_features(stream: BinaryIO) -> Iterator[Tuple[int, Dict, List[Dict]]]:
+    """
+    Read and check the features of a GeoJSON document one at a time.
+    Only the current feature is held in memory, so uploads of any size can be checked.
+
+    Args:
+        stream: Binary file-like object with a FeatureCollection or GeoJSON sequence
+
+    Returns:
+        Iterator of (feature index, feature, errors) tuples
+
+    Raises:
+        GeoJSONStreamError: If the input is not well-formed JSON
+    """
+    for index, feature in iter_geojson_features(stream):
+        yield index, feature, feature_errors(feature, index)
+
+def validate_geojson_stream(stream: BinaryIO, max_errors: int = 100) -> Dict:
+    """
+    Validate a GeoJSON document from a byte stream without loading it whole.
+    Every feature is checked; errors are collected instead of stopping at the first one.
+
+    Args:
+        stream: Binary file-like object with a FeatureCollection or GeoJSON sequence
+        max_errors: Maximum number of errors kept in the report
+
+    Returns:
+        Dictionary with the feature counts and the first max_errors errors
+    """
+    report = {'valid': True, 'features': 0, 'invalid_features': 0, 'error_count': 0, 'errors': []}
+
+    def add(errors):
+        report['error_count'] += len(errors)
+        report['errors'].extend(errors[:max_errors - len(report['errors'])])
+
+    try:
+        for _, _, errors in iter_validated_features(stream):
+            report['features'] += 1
+            if errors:
+                report['invalid_features'] += 1
+                add(errors)
+    except GeoJSONStreamError as e:
+        # Nothing after malformed JSON can be read reliably
+        add([_error(None, '', str(e))])
+
+    report['valid'] = not report['error_count']
+    return report
+
 def validate_year(year: Union[str, int]) -> bool:
     """
     Validate a year value.
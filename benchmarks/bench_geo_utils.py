@@ -0,0 +1,46 @@
+"""
+Micro-benchmark for the Haversine helpers in app.utils.geo_utils.
+Compares the scalar calculate_distance loop with the vectorized
+calculate_distances on a batch of random points.
+
+Usage:
+    python -m benchmarks.bench_geo_utils [--points 100000] [--repeat 5]
+"""
+import argparse
+import random
+import timeit
+
+import numpy as np
+
+from app.utils.geo_utils import calculate_distance, calculate_distances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    center = (37.6173, 55.7558)
+    points = [(rng.uniform(37.0, 38.2), rng.uniform(55.4, 56.1)) for _ in range(args.points)]
+
+    def scalar():
+        return [calculate_distance(center, point) for point in points]
+
+    def vectorized():
+        return calculate_distances(center, points)
+
+    assert np.allclose(scalar(), vectorized())
+
+    scalar_time = min(timeit.repeat(scalar, number=1, repeat=args.repeat))
+    vectorized_time = min(timeit.repeat(vectorized, number=1, repeat=args.repeat))
+
+    print(f"points:     {args.points}")
+    print(f"scalar:     {scalar_time * 1000:.1f} ms")
+    print(f"vectorized: {vectorized_time * 1000:.1f} ms")
+    print(f"speedup:    {scalar_time / vectorized_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark for the prepared-statement registry in DBManager.
+Runs Simulation.get_by_id and GeoObject.get_by_simulation against the
+configured database with prepared statements disabled and enabled, and
+reports the planning time PostgreSQL spends on each query.
+
+Usage:
+    python -m benchmarks.bench_prepared_statements --simulation-id 1 [--iterations 500]
+"""
+import argparse
+import statistics
+import time
+
+from app import create_app, db
+from app.models import GeoObject, Simulation
+
+
+def planning_time_ms(query, params):
+    """Read the planning time of a query from EXPLAIN (ANALYZE, SUMMARY)"""
+    rows = db.execute_query(f"EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) {query}", params)
+    return rows[0]['QUERY PLAN'][0]['Planning Time']
+
+
+def time_calls(func, iterations):
+    """Return per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--simulation-id', type=int, required=True)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    cases = {
+        'Simulation.get_by_id': lambda: Simulation.get_by_id.uncached(args.simulation_id),
+        'GeoObject.get_by_simulation': lambda: GeoObject.get_by_simulation(args.simulation_id),
+    }
+
+    with app.test_request_context():
+        Simulation.get_by_id.uncached(args.simulation_id)
+        by_id_query = db.statements['simulation_get_by_id']['query']
+        by_simulation_query, by_simulation_params = GeoObject._simulation_query(args.simulation_id)
+
+        print("Planning time per execution without prepared statements:")
+        print(f"  Simulation.get_by_id:        "
+              f"{planning_time_ms(by_id_query, (args.simulation_id,)):.3f} ms")
+        print(f"  GeoObject.get_by_simulation: "
+              f"{planning_time_ms(by_simulation_query, by_simulation_params):.3f} ms")
+        print()
+
+        for prepared in (False, True):
+            app.config['DB_PREPARED_STATEMENTS'] = prepared
+            print(f"Prepared statements {'enabled' if prepared else 'disabled'}:")
+            for name, func in cases.items():
+                func()
+                latencies = sorted(time_calls(func, args.iterations))
+                p99 = latencies[int(len(latencies) * 0.99) - 1]
+                print(f"  {name:28} p50 {statistics.median(latencies):8.3f} ms   p99 {p99:8.3f} ms")
+            print()
+
+
+if __name__ == '__main__':
+    main()
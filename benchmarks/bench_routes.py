@@ -0,0 +1,274 @@
+"""
+Endpoint benchmark for every blueprint route.
+Generates a synthetic dataset, serves it from the in-memory DBManager stand-in
+(default) or from a local PostGIS database, and measures throughput, p50/p99
+latency and peak Python memory per route through the Flask test client.
+Results are written as JSON so runs can be compared with benchmarks.compare.
+
+Usage:
+    python -m benchmarks.bench_routes [--objects 10000] [--backend memory|postgres] [--load]
+                                      [--iterations 200] [--output results.json]
+
+The postgres backend uses the DB_* settings; --load replaces the contents of
+that database with the synthetic dataset, so point it at a dedicated database.
+"""
+import argparse
+import datetime
+import json
+import math
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app import create_app, db, reference_cache, compression, spatial_index
+from benchmarks.datasets import SyntheticDataset
+from benchmarks.stand_in import InMemoryDatabase
+
+# Extra requests per endpoint, as (label, query string, headers, JSON body)
+VARIANTS = {
+    'simulation.get_simulations': [
+        ('default', {}, {}, None),
+        ('page', {'limit': 10}, {}, None),
+    ],
+    'geo_object.get_geo_objects_by_simulation': [
+        ('sql', {}, {}, None),
+        ('python', {}, {}, None),
+        ('bbox', 'bbox', {}, None),
+        ('bbox-index', 'bbox', {}, None),
+        ('page', {'limit': 500}, {}, None),
+        ('stream', {'stream': 'true'}, {}, None),
+        ('snapshot', {}, {}, None),
+        ('snapshot-gzip', {}, {'Accept-Encoding': 'gzip'}, None),
+        ('geobuf', {}, {'Accept': 'application/geobuf'}, None),
+        ('zoom', {'zoom': 10}, {}, None),
+    ],
+    'geo_object.get_geo_objects_batch': [
+        ('get', 'ids', {}, None),
+        ('post', {}, {}, 'ids'),
+    ],
+}
+
+# Endpoints whose variants switch configuration
+VARIANT_CONFIG = {
+    ('geo_object.get_geo_objects_by_simulation', 'sql'): {'GEOJSON_SQL_ASSEMBLY': True},
+    ('geo_object.get_geo_objects_by_simulation', 'python'): {'GEOJSON_SQL_ASSEMBLY': False},
+    ('geo_object.get_geo_objects_by_simulation', 'bbox-index'): {'SPATIAL_INDEX_ENABLED': True},
+    ('geo_object.get_geo_objects_by_simulation', 'snapshot'): {'SNAPSHOTS_ENABLED': True},
+    ('geo_object.get_geo_objects_by_simulation', 'snapshot-gzip'): {'SNAPSHOTS_ENABLED': True},
+}
+
+
+def route_arguments(dataset):
+    """Pick URL variables and request parameters that exist in the dataset"""
+    city = dataset.cities[0]
+    timeline = dataset.city_simulations(city['id'], dataset.modes[0]['id'])
+    simulation = timeline[-1]
+    object_ids = list(dataset.links[simulation['id']])
+    lon, lat = city['center']
+    zoom = 12
+    n = 2 ** zoom
+    tile_x = int((lon + 180) / 360 * n)
+    tile_y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+
+    return {
+        'city_id': city['id'],
+        'simulation_id': simulation['id'],
+        'from_simulation_id': timeline[-2]['id'] if len(timeline) > 1 else simulation['id'],
+        'to_simulation_id': simulation['id'],
+        'year': simulation['year'],
+        'mode_id': simulation['mode_id'],
+        'geo_object_id': object_ids[0],
+        'z': zoom,
+        'x': tile_x,
+        'y': tile_y,
+        'bbox': {'minx': lon - 0.05, 'miny': lat - 0.03, 'maxx': lon + 0.05, 'maxy': lat + 0.03},
+        'ids': object_ids[:100],
+    }
+
+
+def build_cases(app, arguments):
+    """Build one request per blueprint route and variant, and a list of routes that were skipped"""
+    cases = []
+    skipped = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if '.' not in rule.endpoint:
+            continue
+        missing = [name for name in rule.arguments if name not in arguments]
+        if missing:
+            skipped.append({'route': rule.rule, 'reason': f"no value for {', '.join(missing)}"})
+            continue
+
+        url = app.url_map.bind('localhost').build(rule.endpoint, {name: arguments[name] for name in rule.arguments})
+        for label, query, headers, body in VARIANTS.get(rule.endpoint, [('default', {}, {}, None)]):
+            if isinstance(query, str):
+                query = {'ids': ','.join(map(str, arguments['ids']))} if query == 'ids' else arguments[query]
+            method = 'POST' if body is not None else 'GET'
+            cases.append({
+                'name': f"{rule.endpoint}[{label}]",
+                'route': rule.rule,
+                'method': method,
+                'url': url,
+                'query': query,
+                'headers': headers,
+                'json': {'ids': arguments['ids']} if body == 'ids' else None,
+                'config': VARIANT_CONFIG.get((rule.endpoint, label), {}),
+            })
+    return cases, skipped
+
+
+def run_case(app, client, case, iterations, warmup, memory_iterations):
+    """Measure one request case"""
+    original = {key: app.config[key] for key in case['config']}
+    app.config.update(case['config'])
+
+    def send():
+        response = client.open(case['url'], method=case['method'], query_string=case['query'],
+                               headers=case['headers'], json=case['json'])
+        body = response.get_data()
+        response.close()
+        return response.status_code, len(body)
+
+    try:
+        for _ in range(warmup):
+            send()
+
+        latencies = []
+        status, size = None, None
+        for _ in range(iterations):
+            started = time.perf_counter()
+            status, size = send()
+            latencies.append(time.perf_counter() - started)
+
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(memory_iterations):
+                tracemalloc.reset_peak()
+                send()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    finally:
+        app.config.update(original)
+
+    latencies.sort()
+    return {
+        'name': case['name'],
+        'route': case['route'],
+        'method': case['method'],
+        'status': status,
+        'response_bytes': size,
+        'iterations': iterations,
+        'throughput_rps': round(iterations / sum(latencies), 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 3),
+        'peak_memory_bytes': peak,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--objects', type=int, default=10_000)
+    parser.add_argument('--cities', type=int, default=3)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--modes', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backend', choices=('memory', 'postgres'), default='memory')
+    parser.add_argument('--load', action='store_true', help='load the dataset into the postgres backend first')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--memory-iterations', type=int, default=3)
+    parser.add_argument('--cold-cache', action='store_true', help='disable the reference data cache')
+    parser.add_argument('--routes', help='only run cases whose name matches this regular expression')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = SyntheticDataset(args.objects, args.cities, args.years, args.modes, seed=args.seed)
+    print(f"Generated {len(dataset.objects)} objects in {len(dataset.simulations)} simulations "
+          f"in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    app = create_app()
+    app.config['TILE_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench-tiles-')
+    app.config['SNAPSHOT_DIR'] = tempfile.mkdtemp(prefix='bench-snapshots-')
+    if args.cold_cache:
+        app.config['REFERENCE_CACHE_TTL'] = 0
+        reference_cache.ttl = 0
+
+    stand_in = None
+    if args.backend == 'memory':
+        stand_in = InMemoryDatabase(dataset)
+        stand_in.install(db)
+    elif args.load:
+        with app.app_context():
+            started = time.perf_counter()
+            dataset.load_into_postgres(db.get_connection())
+            print(f"Loaded the dataset into PostgreSQL in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    cases, skipped = build_cases(app, route_arguments(dataset))
+    if args.routes:
+        cases = [case for case in cases if re.search(args.routes, case['name'])]
+
+    results = []
+    client = app.test_client()
+    try:
+        for case in cases:
+            reference_cache.clear()
+            compression.clear()
+            spatial_index.clear()
+            try:
+                result = run_case(app, client, case, args.iterations, args.warmup, args.memory_iterations)
+            except Exception as e:
+                result = {'name': case['name'], 'route': case['route'], 'error': str(e)}
+            results.append(result)
+
+            if 'error' in result:
+                print(f"{result['name']:70} error: {result['error']}", file=sys.stderr)
+            else:
+                print(f"{result['name']:70} {result['status']} {result['throughput_rps']:9.1f} req/s  "
+                      f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                      f"peak {result['peak_memory_bytes'] / 1024:9.1f} KiB", file=sys.stderr)
+    finally:
+        if stand_in is not None:
+            stand_in.uninstall()
+
+    report = {
+        'meta': {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'dataset': dataset.params,
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'cold_cache': args.cold_cache,
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
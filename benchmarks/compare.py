@@ -0,0 +1,53 @@
+"""
+Compare two result files written by benchmarks.bench_routes.
+Prints throughput and latency changes per case, marking changes beyond the threshold.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 5]
+"""
+import argparse
+import json
+
+
+def load_results(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report['meta'], {result['name']: result for result in report['results'] if 'error' not in result}
+
+
+def change(before, after):
+    return (after - before) / before * 100 if before else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=5.0, help='percent change worth flagging')
+    args = parser.parse_args()
+
+    baseline_meta, baseline = load_results(args.baseline)
+    candidate_meta, candidate = load_results(args.candidate)
+    if baseline_meta['dataset'] != candidate_meta['dataset'] or baseline_meta['backend'] != candidate_meta['backend']:
+        print("Warning: the runs used different datasets or backends")
+
+    print(f"baseline {baseline_meta.get('commit')}  candidate {candidate_meta.get('commit')}")
+    print(f"{'case':70} {'req/s':>9} {'p50':>9} {'p99':>9} {'memory':>9}")
+    for name in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[name], candidate[name]
+        deltas = [
+            change(before['throughput_rps'], after['throughput_rps']),
+            -change(before['p50_ms'], after['p50_ms']),
+            -change(before['p99_ms'], after['p99_ms']),
+            -change(before['peak_memory_bytes'], after['peak_memory_bytes']),
+        ]
+        flag = ' *' if any(abs(delta) >= args.threshold for delta in deltas) else ''
+        print(f"{name:70} " + ' '.join(f"{delta:+8.1f}%" for delta in deltas) + flag)
+
+    for name in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{name:70} only in {'baseline' if name in baseline else 'candidate'}")
+    print("Positive numbers are improvements (higher throughput, lower latency and memory).")
+
+
+if __name__ == '__main__':
+    main()
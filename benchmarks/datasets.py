@@ -0,0 +1,210 @@
+"""
+Synthetic city/simulation/geo-object datasets for the benchmarks.
+Every city gets a pool of objects around its center; each simulation year links
+a sliding window of that pool, so consecutive years mostly overlap and diffs
+stay realistic. The same seed always produces the same dataset.
+"""
+import io
+import json
+import random
+
+ROLES = ('building', 'road', 'park', 'water', 'railway', 'station')
+
+CITY_NAMES = (
+    ('Moscow', 'Москва', 37.6173, 55.7558),
+    ('Saint Petersburg', 'Санкт-Петербург', 30.3351, 59.9343),
+    ('Kazan', 'Казань', 49.1064, 55.7963),
+    ('Novosibirsk', 'Новосибирск', 82.9204, 55.0302),
+    ('Yekaterinburg', 'Екатеринбург', 60.6122, 56.8519),
+    ('Nizhny Novgorod', 'Нижний Новгород', 44.0020, 56.3269),
+)
+
+SCHEMA_SQL = """
+    CREATE EXTENSION IF NOT EXISTS postgis;
+    CREATE TABLE IF NOT EXISTS City (
+        id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_ru TEXT
+    );
+    CREATE TABLE IF NOT EXISTS Mode (
+        id SERIAL PRIMARY KEY,
+        name TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS Simulation (
+        id SERIAL PRIMARY KEY,
+        city_id INTEGER NOT NULL REFERENCES City(id),
+        mode_id INTEGER NOT NULL REFERENCES Mode(id),
+        year INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS GeoObject (
+        id SERIAL PRIMARY KEY,
+        name TEXT,
+        role TEXT,
+        description TEXT,
+        location geometry(Geometry, 4326)
+    );
+    CREATE TABLE IF NOT EXISTS GeoObjectSimulation (
+        geo_object_id INTEGER NOT NULL REFERENCES GeoObject(id) ON DELETE CASCADE,
+        simulation_id INTEGER NOT NULL REFERENCES Simulation(id) ON DELETE CASCADE,
+        PRIMARY KEY (geo_object_id, simulation_id)
+    );
+    CREATE TABLE IF NOT EXISTS SimulationRevision (
+        simulation_id INTEGER PRIMARY KEY REFERENCES Simulation(id) ON DELETE CASCADE,
+        revision TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS geoobject_location_idx ON GeoObject USING GIST (location);
+    CREATE INDEX IF NOT EXISTS geoobjectsimulation_simulation_idx ON GeoObjectSimulation (simulation_id, geo_object_id);
+"""
+
+
+class SyntheticDataset:
+    def __init__(self, objects=10_000, cities=3, years=5, modes=2, churn=0.1, seed=42):
+        """
+        Generate a dataset.
+
+        Args:
+            objects: Total number of geographic objects, split evenly between cities
+            cities: Number of cities
+            years: Number of simulated years per city and mode
+            modes: Number of simulation modes
+            churn: Share of a simulation's objects replaced from one year to the next
+            seed: Random seed
+        """
+        self.params = {'objects': objects, 'cities': cities, 'years': years, 'modes': modes,
+                       'churn': churn, 'seed': seed}
+        rng = random.Random(seed)
+
+        self.modes = [{'id': i, 'name': f'mode {i}'} for i in range(1, modes + 1)]
+        self.cities = []
+        self.simulations = []
+        # id -> (name, role, description, geometry GeoJSON text, (minx, miny, maxx, maxy))
+        self.objects = {}
+        # simulation id -> range of linked object ids
+        self.links = {}
+
+        per_city = objects // cities
+        window = max(1, int(per_city / (1 + (years - 1) * churn)))
+        shift = int(window * churn)
+        next_object_id = 1
+
+        for city_index in range(cities):
+            name, name_ru, lon, lat = CITY_NAMES[city_index % len(CITY_NAMES)]
+            if city_index >= len(CITY_NAMES):
+                name, name_ru = f'{name} {city_index}', f'{name_ru} {city_index}'
+            city = {'id': city_index + 1, 'name': name, 'name_ru': name_ru, 'center': (lon, lat)}
+            self.cities.append(city)
+
+            first_id = next_object_id
+            for _ in range(per_city):
+                self.objects[next_object_id] = self._generate_object(rng, next_object_id, lon, lat)
+                next_object_id += 1
+
+            for mode in self.modes:
+                for year_index in range(years):
+                    simulation_id = len(self.simulations) + 1
+                    self.simulations.append({'id': simulation_id, 'city_id': city['id'], 'mode_id': mode['id'],
+                                             'year': 2000 + year_index * 5})
+                    start = first_id + year_index * shift
+                    self.links[simulation_id] = range(start, min(start + window, first_id + per_city))
+
+    @staticmethod
+    def _generate_object(rng, object_id, lon, lat):
+        role = ROLES[object_id % len(ROLES)]
+        x = lon + rng.gauss(0, 0.08)
+        y = lat + rng.gauss(0, 0.05)
+
+        if role == 'station':
+            geometry = {'type': 'Point', 'coordinates': [round(x, 6), round(y, 6)]}
+        elif role in ('road', 'railway'):
+            points = [[x, y]]
+            for _ in range(rng.randint(2, 8)):
+                points.append([points[-1][0] + rng.uniform(-0.004, 0.004), points[-1][1] + rng.uniform(-0.003, 0.003)])
+            geometry = {'type': 'LineString', 'coordinates': [[round(px, 6), round(py, 6)] for px, py in points]}
+        else:
+            size = 0.0003 if role == 'building' else rng.uniform(0.001, 0.01)
+            ring = [[x, y], [x + size, y], [x + size, y + size * 0.6], [x, y + size * 0.6], [x, y]]
+            geometry = {'type': 'Polygon', 'coordinates': [[[round(px, 6), round(py, 6)] for px, py in ring]]}
+
+        coordinates = _flatten(geometry)
+        bbox = (min(c[0] for c in coordinates), min(c[1] for c in coordinates),
+                max(c[0] for c in coordinates), max(c[1] for c in coordinates))
+        # Every other object shares its name with a neighbour, so diffs contain changed objects
+        name = f'{role} {object_id // 2}'
+        return name, role, f'Synthetic {role} #{object_id}', json.dumps(geometry), bbox
+
+    def city_simulations(self, city_id, mode_id=None):
+        """Get the simulations of a city ordered by year"""
+        return sorted((s for s in self.simulations
+                       if s['city_id'] == city_id and (mode_id is None or s['mode_id'] == mode_id)),
+                      key=lambda s: (s['year'], s['mode_id'], s['id']))
+
+    def load_into_postgres(self, conn, batch_size=50_000):
+        """
+        Replace the contents of the application tables with this dataset using COPY.
+        Only point this at a dedicated benchmark database.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA_SQL)
+            cursor.execute("TRUNCATE GeoObjectSimulation, GeoObject, Simulation, Mode, City RESTART IDENTITY CASCADE")
+            cursor.execute("DROP TABLE IF EXISTS GeoObjectLOD")
+
+            _copy(cursor, 'City (id, name, name_ru)',
+                  ((c['id'], c['name'], c['name_ru']) for c in self.cities), batch_size)
+            _copy(cursor, 'Mode (id, name)', ((m['id'], m['name']) for m in self.modes), batch_size)
+            _copy(cursor, 'Simulation (id, city_id, mode_id, year)',
+                  ((s['id'], s['city_id'], s['mode_id'], s['year']) for s in self.simulations), batch_size)
+            _copy(cursor, 'GeoObject (id, name, role, description, location)',
+                  ((object_id, name, role, description, 'SRID=4326;' + _wkt(json.loads(geometry)))
+                   for object_id, (name, role, description, geometry, _) in self.objects.items()), batch_size)
+            _copy(cursor, 'GeoObjectSimulation (geo_object_id, simulation_id)',
+                  ((object_id, simulation_id) for simulation_id, ids in self.links.items() for object_id in ids),
+                  batch_size)
+
+            # New revision tokens, so caches of an earlier load are not served for this one
+            cursor.execute("INSERT INTO SimulationRevision (simulation_id, revision) "
+                           "SELECT id, md5(random()::text || clock_timestamp()::text) FROM Simulation")
+
+            for table in ('City', 'Mode', 'Simulation', 'GeoObject'):
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                               f"(SELECT COALESCE(max(id), 1) FROM {table}))")
+            cursor.execute("ANALYZE")
+        conn.commit()
+
+
+def _flatten(geometry):
+    coordinates = geometry['coordinates']
+    if geometry['type'] == 'Point':
+        return [coordinates]
+    if geometry['type'] == 'LineString':
+        return coordinates
+    return [point for ring in coordinates for point in ring]
+
+
+def _wkt(geometry):
+    def points(coordinates):
+        return ', '.join(f'{x} {y}' for x, y in coordinates)
+
+    coordinates = geometry['coordinates']
+    if geometry['type'] == 'Point':
+        return f'POINT({coordinates[0]} {coordinates[1]})'
+    if geometry['type'] == 'LineString':
+        return f'LINESTRING({points(coordinates)})'
+    return 'POLYGON(' + ', '.join(f'({points(ring)})' for ring in coordinates) + ')'
+
+
+def _copy(cursor, target, rows, batch_size):
+    """COPY rows into a table in batches of tab-separated text"""
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write('\t'.join('\\N' if value is None else str(value).replace('\\', '\\\\')
+                               .replace('\t', '\\t').replace('\n', '\\n') for value in row))
+        buffer.write('\n')
+        count += 1
+        if count % batch_size == 0:
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {target} FROM STDIN", buffer)
+            buffer = io.StringIO()
+    if buffer.tell():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {target} FROM STDIN", buffer)
@@ -0,0 +1,29 @@
+"""
+WSGI entry point used by benchmarks.load_test.
+Serves the app from the configured PostgreSQL database (BENCH_BACKEND=postgres,
+the default) or from the in-memory DBManager stand-in (BENCH_BACKEND=memory)
+with a simulated per-statement database latency.
+
+Environment:
+    BENCH_BACKEND, BENCH_OBJECTS, BENCH_CITIES, BENCH_YEARS, BENCH_MODES, BENCH_SEED, BENCH_DB_LATENCY_MS
+"""
+import os
+
+from app import create_app, db
+from benchmarks.datasets import SyntheticDataset
+from benchmarks.stand_in import InMemoryDatabase
+
+
+def dataset_from_environment():
+    return SyntheticDataset(int(os.environ.get('BENCH_OBJECTS') or 10_000),
+                            int(os.environ.get('BENCH_CITIES') or 3),
+                            int(os.environ.get('BENCH_YEARS') or 5),
+                            int(os.environ.get('BENCH_MODES') or 2),
+                            seed=int(os.environ.get('BENCH_SEED') or 42))
+
+
+app = create_app()
+
+if (os.environ.get('BENCH_BACKEND') or 'postgres') == 'memory':
+    InMemoryDatabase(dataset_from_environment(),
+                     latency=float(os.environ.get('BENCH_DB_LATENCY_MS') or 0) / 1000).install(db)
@@ -0,0 +1,189 @@
+"""
+Load test of the geo object endpoint under gunicorn with different worker classes.
+Starts gunicorn with gunicorn_conf.py once per worker class, keeps a fixed number
+of concurrent clients sending requests for the duration, and reports throughput,
+p50/p99 latency and errors per worker class.
+
+Usage:
+    python -m benchmarks.load_test [--worker-classes sync gevent] [--workers 2] [--concurrency 64]
+                                   [--duration 10] [--db-latency-ms 20] [--query bbox|page|full]
+                                   [--backend memory|postgres] [--output results.json]
+
+The postgres backend (the default) is the real measurement: it uses the DB_*
+settings and expects the synthetic dataset loaded with
+    python -m benchmarks.bench_routes --backend postgres --load
+so that gevent workers wait on psycopg2 through the cooperative wait callback.
+The memory backend only checks that the worker setup runs: its --db-latency-ms
+is a time.sleep, which gevent patches, so it measures a patched sleep and not
+database I/O.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks.bench_routes import route_arguments, git_commit
+from benchmarks.datasets import SyntheticDataset
+
+
+def request_path(arguments, query):
+    path = f"/api/geo-objects/simulation/{arguments['simulation_id']}"
+    if query == 'bbox':
+        return path + '?' + urlencode(arguments['bbox'])
+    if query == 'page':
+        return path + '?' + urlencode({'limit': 100})
+    return path
+
+
+def start_server(worker_class, args, port):
+    env = dict(os.environ,
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_WORKER_CLASS=worker_class,
+               GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_WORKER_CONNECTIONS=str(args.worker_connections),
+               GUNICORN_ERROR_LOG='-',
+               GUNICORN_LOG_LEVEL='warning',
+               BENCH_BACKEND=args.backend,
+               BENCH_OBJECTS=str(args.objects),
+               BENCH_SEED=str(args.seed),
+               BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+               DB_POOL_MAX_SIZE=str(max(args.concurrency, 10)),
+               METRICS_ENABLED='False')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py',
+                               'benchmarks.load_app:app'], env=env)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/healthcheck/cache')
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start within 60 s")
+
+
+def run_clients(port, path, concurrency, duration):
+    """Keep concurrency clients busy for duration seconds; returns (latencies, errors, elapsed)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        own_latencies = []
+        own_errors = 0
+        start.wait()
+        while time.monotonic() < stop_at[0]:
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    own_errors += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                own_errors += 1
+                conn.close()
+                continue
+            own_latencies.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    started = time.monotonic()
+    stop_at[0] = started + duration
+    start.wait()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--worker-classes', nargs='+', default=['sync', 'gevent'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-connections', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--query', choices=('bbox', 'page', 'full'), default='bbox')
+    parser.add_argument('--backend', choices=('memory', 'postgres'), default='postgres')
+    parser.add_argument('--objects', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-latency-ms', type=float, default=20)
+    parser.add_argument('--port', type=int, default=7107)
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    path = request_path(route_arguments(SyntheticDataset(args.objects, seed=args.seed)), args.query)
+
+    results = []
+    for worker_class in args.worker_classes:
+        server = start_server(worker_class, args, args.port)
+        try:
+            run_clients(args.port, path, args.concurrency, args.warmup)
+            latencies, errors, elapsed = run_clients(args.port, path, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies.sort()
+        result = {
+            'worker_class': worker_class,
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+            'p99_ms': round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 3) if latencies else None,
+        }
+        results.append(result)
+        print(f"{worker_class:10} {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+              f"p99 {result['p99_ms']:8.2f} ms  errors {errors}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'path': path,
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'db_latency_ms': args.db_latency_ms if args.backend == 'memory' else None,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
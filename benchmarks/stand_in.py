@@ -0,0 +1,277 @@
+"""
+In-process stand-in for DBManager backed by a SyntheticDataset.
+It answers the statements issued by the models without PostgreSQL, so route,
+service and serialization overhead can be measured anywhere. Geometry is
+returned as generated: precision, simplification and level-of-detail options
+are accepted but not applied, and vector tiles are placeholder payloads.
+"""
+import contextlib
+import hashlib
+import json
+import math
+import re
+import time
+
+# Text right before a %s placeholder of the simulation source query -> parameter name
+SOURCE_PARAMETERS = (
+    (re.compile(r'gs\.simulation_id = $'), 'simulation_id'),
+    (re.compile(r'ST_MakeEnvelope\((%s, )*$'), 'bbox'),
+    (re.compile(r'g\.id > $'), 'after_id'),
+    (re.compile(r'LIMIT $'), 'limit'),
+)
+
+
+class StandInUnsupported(RuntimeError):
+    """Raised for statements the in-memory stand-in cannot answer"""
+
+
+def bind_parameters(query, params):
+    """Name the parameters of a query by the text in front of their placeholders"""
+    bound = {}
+    for match, value in zip(re.finditer(r'%s', query), params):
+        before = query[max(0, match.start() - 60):match.start()]
+        for pattern, name in SOURCE_PARAMETERS:
+            if pattern.search(before):
+                if name == 'bbox':
+                    bound.setdefault('bbox', []).append(value)
+                else:
+                    bound[name] = value
+                break
+    return bound
+
+
+def tile_bounds(z, x, y):
+    """Get the lon/lat bounds of a Web Mercator tile"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+class InMemoryDatabase:
+    def __init__(self, dataset, latency=0.0):
+        """
+        Args:
+            dataset: SyntheticDataset to answer from
+            latency: Seconds every statement (and every streamed batch) waits, to model database round trips
+        """
+        self.dataset = dataset
+        self.latency = latency
+        self.cities = {city['id']: city for city in dataset.cities}
+        self.modes = {mode['id']: mode for mode in dataset.modes}
+        self.simulations = {simulation['id']: simulation for simulation in dataset.simulations}
+        self._installed = {}
+
+    def install(self, db):
+        """Route the statements of a DBManager to this stand-in until uninstall()"""
+        self._installed = {
+            'execute_query': self.execute_query,
+            'execute_read': self.execute_read,
+            'execute_prepared': self.execute_prepared,
+            'stream_query': self.stream_query,
+            'execute_many': self.execute_many,
+            'call_procedure': self.call_procedure,
+            'transaction': self.transaction,
+        }
+        self.db = db
+        db.__dict__.update(self._installed)
+
+    def uninstall(self):
+        for name in self._installed:
+            self.db.__dict__.pop(name, None)
+        self._installed = {}
+
+    @contextlib.contextmanager
+    def transaction(self, read_only=False, isolation_level=None):
+        yield None
+
+    def execute_query(self, query, params=None, fetchone=False):
+        return self._answer('query', query, params or (), fetchone)
+
+    def execute_read(self, query, params=None, fetchone=False):
+        return self._answer('read', query, params or (), fetchone)
+
+    def execute_prepared(self, name, params=None, fetchone=False):
+        statement = self.db.statements[name]
+        return self._answer('prepared', statement['query'], params or (), fetchone, name)
+
+    def stream_query(self, query, params=None, batch_size=None):
+        batch_size = batch_size or 2000
+        with self.db._instrumented('stream', query) as observation:
+            rows = self._simulation_objects(bind_parameters(query, params or ()))
+            for start in range(0, len(rows), batch_size):
+                self._wait()
+                observation['rows'] += len(rows[start:start + batch_size])
+                yield rows[start:start + batch_size]
+
+    def execute_many(self, query, params_list):
+        raise StandInUnsupported(f"The in-memory stand-in does not support writes: {' '.join(query.split())[:80]}")
+
+    def call_procedure(self, procedure_name, params=None):
+        raise StandInUnsupported(f"The in-memory stand-in does not support procedures: {procedure_name}")
+
+    def _answer(self, operation, query, params, fetchone, name=None):
+        with self.db._instrumented(operation, query, name) as observation:
+            self._wait()
+            result = self._dispatch(query, params, name)
+            if fetchone and isinstance(result, list):
+                result = result[0] if result else None
+            observation['rows'] = len(result) if isinstance(result, list) else int(result is not None)
+            return result
+
+    def _wait(self):
+        # time.sleep yields to other greenlets when the worker is monkey-patched
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _dispatch(self, query, params, name):
+        if name:
+            if name.startswith('geo_object_get_by_simulation_'):
+                return self._simulation_objects(bind_parameters(query, params))
+            handler = getattr(self, f'_{name}', None)
+            if handler is not None:
+                return handler(*params)
+        elif "'FeatureCollection'" in query:
+            return self._feature_collection(query, params)
+        elif 'CREATE TABLE IF NOT EXISTS SimulationRevision' in query:
+            return None
+        elif 'to_regclass' in query:
+            return [{'exists': True}]
+        elif 'FROM GeoObjectLOD' in query:
+            return [{'available': True}]
+        elif 'ST_AsMVT' in query:
+            return self._tile(*params[:3], params[5])
+        elif 'EXCEPT' in query:
+            return self._diff(*params[:2])
+        elif 'ANY(%s)' in query:
+            return self._objects(params[-1])
+        elif 'WHERE g.id = %s' in query:
+            return self._objects([params[-1]])
+        elif 'FROM Simulation s' in query and 'ORDER BY s.id' in query:
+            return self._simulation_list(query, params)
+        raise StandInUnsupported(f"The in-memory stand-in cannot answer: {' '.join(query.split())[:80]}")
+
+    def _city_get_all(self):
+        return [{'id': c['id'], 'name': c['name'], 'name_ru': c['name_ru']} for c in self.cities.values()]
+
+    def _city_get_by_id(self, city_id):
+        city = self.cities.get(city_id)
+        return [{'id': city['id'], 'name': city['name'], 'name_ru': city['name_ru']}] if city else []
+
+    def _simulation_row(self, simulation):
+        return {'id': simulation['id'], 'year': simulation['year'], 'city_id': simulation['city_id'],
+                'mode_id': simulation['mode_id'], 'city_name': self.cities[simulation['city_id']]['name'],
+                'mode_name': self.modes[simulation['mode_id']]['name']}
+
+    def _simulation_get_by_id(self, simulation_id):
+        simulation = self.simulations.get(simulation_id)
+        return [self._simulation_row(simulation)] if simulation else []
+
+    def _simulation_get_by_city_year(self, city_id, year, mode_id):
+        return [self._simulation_row(s) for s in self.dataset.simulations
+                if (s['city_id'], s['year'], s['mode_id']) == (city_id, year, mode_id)][:1]
+
+    def _simulation_get_years_by_city(self, city_id):
+        return [{'year': year} for year in sorted({s['year'] for s in self.dataset.city_simulations(city_id)})]
+
+    def _simulation_get_timeline_by_city(self, city_id):
+        timeline = {}
+        for simulation in self.dataset.city_simulations(city_id):
+            timeline.setdefault(simulation['year'], simulation['id'])
+        return [{'year': year, 'simulation_id': simulation_id} for year, simulation_id in timeline.items()]
+
+    def _mode_get_all_ids(self):
+        return [{'id': mode_id} for mode_id in self.modes]
+
+    def _geo_object_get_simulation_version(self, simulation_id):
+        # The dataset never changes, so its parameters stand in for the revision token
+        if simulation_id not in self.simulations:
+            return []
+        return [{'revision': hashlib.md5(repr((self.dataset.params, simulation_id)).encode('utf-8')).hexdigest()}]
+
+    def _simulation_list(self, query, params):
+        after_id = params[0] if 's.id > %s' in query else None
+        limit = params[-1] if 'LIMIT %s' in query else None
+        rows = [{'id': s['id'], 'year': s['year'], 'city_name': self.cities[s['city_id']]['name'],
+                 'mode_name': self.modes[s['mode_id']]['name']}
+                for s in self.dataset.simulations if after_id is None or s['id'] > after_id]
+        return rows[:limit] if limit is not None else rows
+
+    def _object_row(self, object_id):
+        name, role, description, geometry, (minx, miny, maxx, maxy) = self.dataset.objects[object_id]
+        return {'id': object_id, 'name': name, 'role': role, 'description': description, 'geometry': geometry,
+                'minx': minx, 'miny': miny, 'maxx': maxx, 'maxy': maxy}
+
+    def _objects(self, object_ids):
+        return [self._object_row(object_id) for object_id in object_ids if object_id in self.dataset.objects]
+
+    def _simulation_objects(self, bound):
+        ids = self.dataset.links.get(bound.get('simulation_id'), range(0))
+        after_id = bound.get('after_id')
+        if after_id is not None:
+            ids = range(max(ids.start, after_id + 1), ids.stop)
+
+        bbox = bound.get('bbox')
+        limit = bound.get('limit')
+        rows = []
+        for object_id in ids:
+            if bbox:
+                minx, miny, maxx, maxy = self.dataset.objects[object_id][4]
+                if maxx < bbox[0] or minx > bbox[2] or maxy < bbox[1] or miny > bbox[3]:
+                    continue
+            rows.append(self._object_row(object_id))
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def _feature_collection(self, query, params):
+        simulation_id = params[-1]
+        simulation = self.simulations.get(simulation_id)
+        if simulation is None:
+            return []
+
+        rows = self._simulation_objects(bind_parameters(query, params[:-1]))
+        features = ', '.join(
+            '{"type": "Feature", "geometry": ' + row['geometry'] + ', "properties": ' + json.dumps(
+                {'id': row['id'], 'name': row['name'], 'role': row['role'], 'description': row['description']}
+            ) + '}'
+            for row in rows
+        )
+        metadata = {'simulation_id': simulation_id, 'year': simulation['year'],
+                    'city': self.cities[simulation['city_id']]['name'],
+                    'mode': self.modes[simulation['mode_id']]['name'], 'count': len(rows),
+                    'bbox': json.loads(params[0]) if params[0] else None}
+        geojson = '{"type": "FeatureCollection", "features": [' + features + '], "metadata": ' + \
+                  json.dumps(metadata) + '}'
+        return [{'geojson': geojson, 'count': len(rows), 'last_id': rows[-1]['id'] if rows else None}]
+
+    def _tile(self, z, x, y, simulation_id):
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        rows = self._simulation_objects({'simulation_id': simulation_id, 'bbox': [minx, miny, maxx, maxy]})
+        # Placeholder payload whose size grows with the number of objects in the tile
+        return [{'tile': b''.join(row['geometry'].encode('utf-8') for row in rows)}]
+
+    def _diff(self, from_simulation_id, to_simulation_id):
+        before = set(self.dataset.links.get(from_simulation_id, ()))
+        after = set(self.dataset.links.get(to_simulation_id, ()))
+        added, removed = sorted(after - before), sorted(before - after)
+
+        candidates = {}
+        for side, ids in (('added', added), ('removed', removed)):
+            for object_id in ids:
+                name, role = self.dataset.objects[object_id][:2]
+                candidates.setdefault((name, role), {'added': [], 'removed': []})[side].append(object_id)
+        changed = {entry['added'][0]: entry['removed'][0] for entry in candidates.values()
+                   if len(entry['added']) == 1 and len(entry['removed']) == 1}
+        previous = set(changed.values())
+
+        rows = [{'change': 'added', 'previous_id': None, **self._object_row(object_id)}
+                for object_id in added if object_id not in changed]
+        rows += [{'change': 'changed', 'previous_id': changed[object_id], **self._object_row(object_id)}
+                 for object_id in sorted(changed)]
+        rows += [{'change': 'removed', 'id': object_id, 'previous_id': None, 'name': None, 'role': None,
+                  'description': None, 'geometry': None}
+                 for object_id in removed if object_id not in previous]
+        return rows
@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration.
+Serves the app with sync workers by default, one request at a time per worker.
+Set GUNICORN_WORKER_CLASS=gevent to opt in to cooperative workers: every worker
+handles many requests concurrently and yields to the others while it waits on
+PostgreSQL. Bulk imports (COPY) do not work in gevent workers.
+
+Usage:
+    gunicorn -c gunicorn_conf.py run:app
+
+The database pool is per worker, so with gevent workers DB_POOL_MAX_SIZE caps
+the number of queries a worker runs at once; requests beyond it wait up to
+DB_POOL_TIMEOUT for a connection.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:7007'
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'sync'
+cooperative = worker_class in ('gevent', 'gunicorn.workers.ggevent.GeventWorker')
+
+# Blocking workers need more processes to overlap database waits
+workers = int(os.environ.get('GUNICORN_WORKERS') or
+              (multiprocessing.cpu_count() if cooperative else multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS') or 1000)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 60)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT') or 30)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE') or 5)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 0)
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or 0)
+
+# The gevent worker monkey-patches the standard library when it starts. The app has
+# to be imported after that, so that its locks and the psycopg2 wait callback are
+# cooperative; preloading in the master would import it unpatched.
+preload_app = (os.environ.get('GUNICORN_PRELOAD_APP') or 'False') == 'True' and not cooperative
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = os.environ.get('GUNICORN_ERROR_LOG') or '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL') or 'info'
+
+
+def post_worker_init(worker):
+    if cooperative:
+        from app import db
+        worker.log.info(f"Worker {worker.pid} serving cooperatively: {db.cooperative}")
+
+    # The first worker to start builds missing snapshots when SNAPSHOT_WARMUP is set
+    from app.services import SnapshotService
+    SnapshotService.start_warm_up(worker.wsgi)
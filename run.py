@@ -3,4 +3,6 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    from app.services import SnapshotService
+    SnapshotService.start_warm_up(app)
     app.run(host='0.0.0.0', port=7007, debug=True)